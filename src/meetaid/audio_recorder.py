@@ -1,11 +1,20 @@
+from typing import Any, Dict, List, Optional
+
 import logging
 import os
 import wave
 from queue import Queue
 
-import pyaudiowpatch as pyaudio
 from pydub import AudioSegment
 
+from meetaid.capture import PA_CONTINUE, PA_INT24, Callback, CaptureBackend
+from meetaid.flac_encoder import FlacEncoder, mix_files
+
+try:
+    import pyaudiowpatch as pyaudio
+except ImportError:  # WASAPI is Windows only; replay backends still work
+    pyaudio = None
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -14,7 +23,7 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-data_format = pyaudio.paInt24  # 24 bits per sample
+data_format = pyaudio.paInt24 if pyaudio is not None else PA_INT24
 
 
 class ARException(Exception):
@@ -29,18 +38,74 @@ class InvalidDevice(ARException):
     ...
 
 
-class AudioRecorder:
-    CHUNK_SIZE = 512
+class WASAPIBackend(CaptureBackend):
+    """Captures the default speakers via WASAPI loopback plus the mic"""
 
     def __init__(self):
+        if pyaudio is None:
+            raise WASAPINotFound("pyaudiowpatch is not installed")
         self.p = pyaudio.PyAudio()
-        self.spkr_queue = Queue()
-        self.mic_queue = Queue()
-        self.spkr_stream = None
-        self.mic_stream = None
+        self.sample_width = pyaudio.get_sample_size(data_format)
+        self.device: Optional[Dict[str, Any]] = None
+
+    def _get_device(self) -> Dict[str, Any]:
+        if self.device is None:
+            self.device = AudioRecorder.get_default_wasapi_device(self.p)
+            self.channels = self.device["maxInputChannels"]
+            self.rate = int(self.device["defaultSampleRate"])
+        return self.device
+
+    def open_stream(
+        self, callback: Callback, frames_per_buffer: int, loopback: bool
+    ) -> Any:
+        device = self._get_device()
+        kwargs: Dict[str, Any] = {}
+        if loopback:
+            kwargs["input_device_index"] = device["index"]
+        return self.p.open(
+            format=data_format,
+            channels=self.channels,
+            rate=self.rate,
+            frames_per_buffer=frames_per_buffer,
+            input=True,
+            stream_callback=callback,
+            **kwargs,
+        )
+
+    def terminate(self) -> None:
+        self.p.terminate()
+
+
+class AudioRecorder:
+    CHUNK_SIZE = 512
+
+    def __init__(
+        self,
+        backend: Optional[CaptureBackend] = None,
+        output_dir: str = "output",
+        audio_format: str = "wav",
+    ):
+        """
+        Args:
+            backend: Source of the audio, WASAPI loopback by default.
+            output_dir: Where recordings are written.
+            audio_format: "wav" writes raw PCM when recording stops,
+                "flac" encodes lossless FLAC in the background while
+                recording.
+        """
+        if audio_format not in ("wav", "flac"):
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        self.backend = backend if backend is not None else WASAPIBackend()
+        self.output_dir = output_dir
+        self.audio_format = audio_format
+        self.encoders: List[FlacEncoder] = []
+        self.spkr_queue: Queue[Optional[bytes]] = Queue()
+        self.mic_queue: Queue[Optional[bytes]] = Queue()
+        self.spkr_stream: Optional[Any] = None
+        self.mic_stream: Optional[Any] = None
 
     @staticmethod
-    def get_default_wasapi_device(p_audio: pyaudio.PyAudio):
+    def get_default_wasapi_device(p_audio: Any) -> Dict[str, Any]:
         try:  # Get default WASAPI info
             wasapi_info = p_audio.get_host_api_info_by_type(pyaudio.paWASAPI)
         except OSError:
@@ -53,90 +118,83 @@ class AudioRecorder:
             wasapi_info["defaultOutputDevice"]
         )
 
-        if not sys_default_speakers["isLoopbackDevice"]:
-            for loopback in p_audio.get_loopback_device_info_generator():
-                if sys_default_speakers["name"] in loopback["name"]:
-                    return loopback
-                    break
-            else:
-                raise InvalidDevice(
-                    "Default loopback output device not found.\n\nRun "
-                    "`python -m pyaudiowpatch` to check available devices"
-                )
+        if sys_default_speakers["isLoopbackDevice"]:
+            return sys_default_speakers
+        for loopback in p_audio.get_loopback_device_info_generator():
+            if sys_default_speakers["name"] in loopback["name"]:
+                return loopback
+        raise InvalidDevice(
+            "Default loopback output device not found.\n\nRun "
+            "`python -m pyaudiowpatch` to check available devices"
+        )
 
     def spkr_callback(self, in_data, frame_count, time_info, status):
         """Write frames and return PA flag"""
         self.spkr_queue.put(in_data)
-        return (in_data, pyaudio.paContinue)
+        return (in_data, PA_CONTINUE)
 
     def mic_callback(self, in_data, frame_count, time_info, status):
         """Write frames and return PA flag"""
         self.mic_queue.put(in_data)
-        return (in_data, pyaudio.paContinue)
+        return (in_data, PA_CONTINUE)
 
     def start_recording(self, unique_id):
+        if self.spkr_stream is not None:
+            logger.warning("Previous recording was not stopped, finishing it")
+            self.stop_recording()
         self.close_stream()
+        # Fresh queues so nothing left from a previous recording reaches
+        # this one's encoders
+        self.spkr_queue = Queue()
+        self.mic_queue = Queue()
 
         self.unique_id = unique_id
-        self.spkr_filename = f"output/spkr_{unique_id}.wav"
-        self.mic_filename = f"output/mic_{unique_id}.wav"
-        self.combined_filename = f"output/audio_{unique_id}.wav"
-        target_device = None
+        ext = self.audio_format
+        self.spkr_filename = f"{self.output_dir}/spkr_{unique_id}.{ext}"
+        self.mic_filename = f"{self.output_dir}/mic_{unique_id}.{ext}"
+        self.combined_filename = f"{self.output_dir}/audio_{unique_id}.{ext}"
         try:
-            target_device = ar.get_default_wasapi_device(self.p)
+            self.spkr_stream = self.backend.open_stream(
+                self.spkr_callback, self.CHUNK_SIZE, loopback=True
+            )
+            self.mic_stream = self.backend.open_stream(
+                self.mic_callback, self.CHUNK_SIZE, loopback=False
+            )
         except ARException as E:
             print(
                 f"Something went wrong... {type(E)} = " f"{str(E)[:30]}...\n"
             )
-
-        self.spkr_stream = self.p.open(
-            format=data_format,
-            channels=target_device["maxInputChannels"],
-            rate=int(target_device["defaultSampleRate"]),
-            frames_per_buffer=self.CHUNK_SIZE,
-            input=True,
-            input_device_index=target_device["index"],
-            stream_callback=self.spkr_callback,
-        )
-        self.mic_stream = self.p.open(
-            format=data_format,
-            channels=target_device["maxInputChannels"],
-            rate=int(target_device["defaultSampleRate"]),
-            frames_per_buffer=self.CHUNK_SIZE,
-            input=True,
-            stream_callback=self.mic_callback,
-        )
+            self.close_stream()
+            return
+
+        if self.audio_format == "flac":
+            self.encoders = [
+                FlacEncoder(
+                    queue,
+                    filename,
+                    self.backend.channels,
+                    self.backend.rate,
+                    self.backend.sample_width,
+                )
+                for queue, filename in (
+                    (self.spkr_queue, self.spkr_filename),
+                    (self.mic_queue, self.mic_filename),
+                )
+            ]
+            for encoder in self.encoders:
+                encoder.start()
 
     def stop_recording(self) -> str:
         self.close_stream()
 
-        target_device = None
-        try:
-            target_device = ar.get_default_wasapi_device(self.p)
-        except ARException as E:
-            print(
-                f"Something went wrong... {type(E)} = " f"{str(E)[:30]}...\n"
-            )
+        if self.audio_format == "flac":
+            return self._finish_flac()
 
         if not self.spkr_queue.empty():
-            spkr_file = wave.open(self.spkr_filename, "wb")
-            spkr_file.setnchannels(target_device["maxInputChannels"])
-            spkr_file.setsampwidth(pyaudio.get_sample_size(data_format))
-            spkr_file.setframerate(int(target_device["defaultSampleRate"]))
-
-            while not self.spkr_queue.empty():
-                spkr_file.writeframes(self.spkr_queue.get())
-            spkr_file.close()
+            self._write_queue(self.spkr_queue, self.spkr_filename)
 
         if not self.mic_queue.empty():
-            mic_file = wave.open(self.mic_filename, "wb")
-            mic_file.setnchannels(target_device["maxInputChannels"])
-            mic_file.setsampwidth(pyaudio.get_sample_size(data_format))
-            mic_file.setframerate(int(target_device["defaultSampleRate"]))
-
-            while not self.mic_queue.empty():
-                mic_file.writeframes(self.mic_queue.get())
-            mic_file.close()
+            self._write_queue(self.mic_queue, self.mic_filename)
 
         if not os.path.exists(self.spkr_filename):
             os.rename(self.mic_filename, self.combined_filename)
@@ -151,6 +209,37 @@ class AudioRecorder:
             os.remove(self.spkr_filename)
         return self.combined_filename
 
+    def _finish_flac(self) -> str:
+        written = []
+        for encoder in self.encoders:
+            # Keep what was written even if the encoder hit an error
+            if encoder.finish() > 0:
+                written.append(encoder.filename)
+            elif os.path.exists(encoder.filename):
+                os.remove(encoder.filename)
+        self.encoders = []
+
+        if len(written) == 1:
+            os.rename(written[0], self.combined_filename)
+        elif written:
+            mix_files(written, self.combined_filename)
+            for filename in written:
+                os.remove(filename)
+        return self.combined_filename
+
+    def _write_queue(
+        self, queue: Queue[Optional[bytes]], filename: str
+    ) -> None:
+        with wave.open(filename, "wb") as wav_file:
+            wav_file.setnchannels(self.backend.channels)
+            wav_file.setsampwidth(self.backend.sample_width)
+            wav_file.setframerate(self.backend.rate)
+
+            while not queue.empty():
+                chunk = queue.get()
+                if chunk is not None:
+                    wav_file.writeframes(chunk)
+
     def stop_stream(self):
         self.spkr_stream.stop_stream()
         self.mic_stream.stop_stream()
@@ -170,7 +259,7 @@ class AudioRecorder:
             self.mic_stream = None
 
     def terminate(self):
-        self.p.terminate()
+        self.backend.terminate()
 
     @property
     def stream_status(self):
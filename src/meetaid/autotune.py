@@ -0,0 +1,315 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gc
+import logging
+import threading
+import time
+from functools import partial
+
+import click
+import cv2
+import easyocr
+import numpy as np
+import psutil
+import torch
+import whisper
+
+from meetaid.profile import save_profile
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+# Candidate ASR models, from fastest to most accurate
+WHISPER_MODELS = ("tiny.en", "base.en", "small.en", "medium.en", "large-v2")
+LANGUAGE = "en"
+# Whisper transcription of an hour of audio in half an hour. Alignment,
+# diarization and speaker identification take time on top of this.
+TARGET_ASR_RTF = 0.5
+CALIBRATION_SECONDS = 60.0
+OCR_WORKERS = (0, 2, 4)
+OCR_BATCH_SIZES = (1, 4, 8)
+OCR_FRAMES = 5
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.argument("audio_loc")
+@click.option(
+    "--video",
+    "video_loc",
+    default=None,
+    help="Screen recording to calibrate OCR with",
+)
+@click.option(
+    "--target-asr-rtf",
+    default=TARGET_ASR_RTF,
+    show_default=True,
+    help="Whisper (ASR stage only) time budget as a fraction of the audio"
+    " length",
+)
+@click.option(
+    "--memory-budget",
+    type=float,
+    default=None,
+    help="Memory the transcription model may use on its device (GPU memory"
+    " with CUDA, else RAM), in MB",
+)
+@click.option(
+    "--seconds",
+    default=CALIBRATION_SECONDS,
+    show_default=True,
+    help="Length of audio to calibrate with",
+)
+def main(
+    audio_loc: str,
+    video_loc: Optional[str],
+    target_asr_rtf: float,
+    memory_budget: Optional[float],
+    seconds: float,
+) -> None:
+    """Measure this host and save the settings transcriber/reader use"""
+    profile: Dict[str, Any] = {
+        "transcriber": tune_transcriber(
+            audio_loc, target_asr_rtf, memory_budget, seconds
+        )
+    }
+    if video_loc is not None:
+        profile["reader"] = tune_reader(video_loc)
+    profile_loc = save_profile(profile)
+    logger.info(f"Profile written to {profile_loc}")
+
+
+def memory_usage() -> Tuple[int, int]:
+    """Resident host memory and allocated CUDA memory, in bytes"""
+    gpu = torch.cuda.memory_allocated() if torch.cuda.is_available() else 0
+    return psutil.Process().memory_info().rss, gpu
+
+
+def measure(
+    run: Callable[[], Any], baseline: Optional[Tuple[int, int]] = None
+) -> Tuple[float, float, float]:
+    """
+    Time a function and sample how much memory it takes.
+
+    Args:
+        run: The function to measure.
+        baseline: Host and CUDA memory use (from `memory_usage`) to
+            measure from. Defaults to the use when `run` starts; pass an
+            earlier one to also count what was set up for `run`, such as
+            a model.
+
+    Returns:
+        Elapsed seconds, and the peak host (resident) and CUDA memory
+        above the baseline in MB.
+    """
+    if baseline is None:
+        baseline = memory_usage()
+    process = psutil.Process()
+    peak_rss = process.memory_info().rss
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak_rss
+        while not done.wait(0.05):
+            peak_rss = max(peak_rss, process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        run()
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    peak_gpu = (
+        torch.cuda.max_memory_allocated() if torch.cuda.is_available() else 0
+    )
+    return (
+        elapsed,
+        max(0, peak_rss - baseline[0]) / 2**20,
+        max(0, peak_gpu - baseline[1]) / 2**20,
+    )
+
+
+def tune_transcriber(
+    audio_loc: str,
+    target_asr_rtf: float = TARGET_ASR_RTF,
+    memory_budget_mb: Optional[float] = None,
+    seconds: float = CALIBRATION_SECONDS,
+) -> Dict[str, Any]:
+    """
+    Find the most accurate Whisper model and precision that transcribes
+    within the time and memory budgets on this host. Only the ASR stage is
+    measured, not alignment, diarization or speaker identification.
+
+    Args:
+        audio_loc: Audio to calibrate with, ideally a typical meeting.
+        target_asr_rtf: Highest acceptable ASR real-time factor (Whisper
+            transcription time divided by audio length).
+        memory_budget_mb: Highest acceptable peak memory taken by the
+            model on its device (GPU with CUDA, else host), None for any.
+        seconds: Length of audio to calibrate with.
+
+    Returns:
+        The transcriber section of the profile.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    audio = whisper.load_audio(audio_loc)[
+        : int(seconds * whisper.audio.SAMPLE_RATE)
+    ]
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+    # Start CUDA and load the decoding code before anything is measured, so
+    # the first candidate doesn't pay for it
+    model = whisper.load_model(WHISPER_MODELS[0], device)
+    model.transcribe(
+        audio[: whisper.audio.SAMPLE_RATE],
+        fp16=device == "cuda",
+        language=LANGUAGE,
+    )
+    del model
+    _free_memory()
+    candidates: List[Dict[str, Any]] = []
+    for model_name in WHISPER_MODELS:
+        for fp16 in (True, False) if device == "cuda" else (False,):
+            logger.info(f"Calibrating {model_name} on {device}, fp16={fp16}")
+            baseline = memory_usage()
+            model = whisper.load_model(model_name, device)
+            # Decode as transcriber.transcribe_file does
+            run = partial(
+                model.transcribe, audio, fp16=fp16, language=LANGUAGE
+            )
+            elapsed, host_mb, gpu_mb = measure(run, baseline)
+            del model, run
+            _free_memory()
+            asr_rtf = elapsed / duration
+            logger.info(
+                f"ASR RTF {asr_rtf:.3f}, peak memory {host_mb:.0f} MB host,"
+                f" {gpu_mb:.0f} MB GPU"
+            )
+            candidates.append(
+                {
+                    "whisper_model": model_name,
+                    "device": device,
+                    "fp16": fp16,
+                    "asr_rtf": asr_rtf,
+                    "host_memory_mb": host_mb,
+                    "gpu_memory_mb": gpu_mb,
+                }
+            )
+        # Larger models will only be slower
+        model_asr_rtfs = [
+            c["asr_rtf"]
+            for c in candidates
+            if c["whisper_model"] == model_name
+        ]
+        if min(model_asr_rtfs) > target_asr_rtf:
+            break
+
+    fitting = [
+        c
+        for c in candidates
+        if c["asr_rtf"] <= target_asr_rtf
+        and (
+            memory_budget_mb is None
+            or c["gpu_memory_mb" if device == "cuda" else "host_memory_mb"]
+            <= memory_budget_mb
+        )
+    ]
+    if fitting:
+        # The most accurate model, at its faster precision
+        best = max(
+            fitting,
+            key=lambda c: (
+                WHISPER_MODELS.index(c["whisper_model"]),
+                -c["asr_rtf"],
+            ),
+        )
+    else:
+        best = min(candidates, key=lambda c: c["asr_rtf"])
+        logger.warning(
+            f"No model meets ASR RTF {target_asr_rtf}, using the fastest:"
+            f" {best['whisper_model']}"
+        )
+    logger.info(f"Selected {best}")
+    return dict(best, target_asr_rtf=target_asr_rtf)
+
+
+def _free_memory() -> None:
+    """Free a released model's memory before the next one is measured"""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def sample_frames(video_loc: str, count: int = OCR_FRAMES) -> List[np.ndarray]:
+    """Frames spread evenly through a video"""
+    capture = cv2.VideoCapture(video_loc)
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for i in range(count):
+        position = (2 * i + 1) * total // (2 * count)
+        capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+        ok, frame = capture.read()
+        if ok:
+            frames.append(frame)
+    capture.release()
+    return frames
+
+
+def tune_reader(video_loc: str, frames: int = OCR_FRAMES) -> Dict[str, Any]:
+    """
+    Find the fastest OCR worker count and batch size on this host.
+
+    Args:
+        video_loc: Screen recording to calibrate with.
+        frames: Number of frames to read per candidate.
+
+    Returns:
+        The reader section of the profile.
+    """
+    gpu = torch.cuda.is_available()
+    images = sample_frames(video_loc, frames)
+    if not images:
+        raise click.ClickException(f"Could not read frames from {video_loc}")
+    baseline = memory_usage()
+    reader = easyocr.Reader([LANGUAGE], gpu=gpu)
+    reader.readtext(images[0])  # Warm up
+    best: Dict[str, Any] = {}
+    for workers in OCR_WORKERS:
+        for batch_size in OCR_BATCH_SIZES:
+            elapsed, host_mb, gpu_mb = measure(
+                lambda: [
+                    reader.readtext(
+                        image, workers=workers, batch_size=batch_size
+                    )
+                    for image in images
+                ],
+                baseline,
+            )
+            seconds_per_frame = elapsed / len(images)
+            logger.info(
+                f"OCR workers={workers}, batch_size={batch_size}:"
+                f" {seconds_per_frame:.3f}s per frame"
+            )
+            if not best or seconds_per_frame < best["seconds_per_frame"]:
+                best = {
+                    "gpu": gpu,
+                    "workers": workers,
+                    "batch_size": batch_size,
+                    "seconds_per_frame": seconds_per_frame,
+                    "host_memory_mb": host_mb,
+                    "gpu_memory_mb": gpu_mb,
+                }
+    logger.info(f"Selected {best}")
+    return best
+
+
+if __name__ == "__main__":
+    main()
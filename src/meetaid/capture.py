@@ -0,0 +1,282 @@
+"""Audio capture backends for AudioRecorder.
+
+A backend opens input streams that deliver chunks of PCM frames to a
+PortAudio-style callback ``callback(in_data, frame_count, time_info,
+status) -> (out_data, flag)``. The WASAPI loopback backend lives in
+`meetaid.audio_recorder`; the replay backends here run anywhere and are
+used to exercise and benchmark the recorder's capture path.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import logging
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from array import array
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# PortAudio callback return flags
+PA_CONTINUE = 0
+PA_COMPLETE = 1
+# PortAudio sample format of 24-bit PCM (paInt24)
+PA_INT24 = 4
+
+Callback = Callable[[bytes, int, Dict[str, Any], int], Tuple[Any, int]]
+
+
+class CaptureBackend(ABC):
+    """Base class for a source of speaker (loopback) and mic streams"""
+
+    sample_width = 3  # bytes per sample
+    channels = 2
+    rate = 48000
+
+    @abstractmethod
+    def open_stream(
+        self, callback: Callback, frames_per_buffer: int, loopback: bool
+    ) -> Any:
+        """
+        Open and start an input stream.
+
+        Args:
+            callback: Called with each chunk of captured frames.
+            frames_per_buffer: Frames per chunk.
+            loopback: True for the speaker (loopback) stream, False for
+                the microphone.
+
+        Returns:
+            A stream with `start_stream`, `stop_stream`, `close` and
+            `is_stopped` methods.
+        """
+
+    def terminate(self) -> None:
+        """Release backend resources"""
+
+
+class ReplayStream:
+    """
+    Stream that calls the callback from a thread at the pace of a real
+    device (`speed` 1.0), faster (`speed` > 1.0) or as fast as possible
+    (`speed` 0). Callback lateness and duration are recorded in seconds
+    for benchmarking.
+    """
+
+    def __init__(
+        self,
+        read_chunk: Callable[[int], bytes],
+        callback: Callback,
+        frames_per_buffer: int,
+        rate: int,
+        speed: float = 1.0,
+        duration: Optional[float] = None,
+    ):
+        self.read_chunk = read_chunk
+        self.callback = callback
+        self.frames_per_buffer = frames_per_buffer
+        self.rate = rate
+        self.speed = speed
+        self.max_chunks = (
+            None
+            if duration is None
+            else int(duration * rate / frames_per_buffer)
+        )
+        self.chunks = 0
+        self.lateness = array("d")
+        self.durations = array("d")
+        self.finished = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.start_stream()
+
+    def start_stream(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop_stream(self) -> None:
+        self._stopped.set()
+        if (
+            self._thread is not None
+            and self._thread is not threading.current_thread()
+        ):
+            self._thread.join()
+
+    def close(self) -> None:
+        self.stop_stream()
+
+    def is_stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def is_active(self) -> bool:
+        return not self._stopped.is_set() and not self.finished.is_set()
+
+    def _run(self) -> None:
+        interval = (
+            self.frames_per_buffer / self.rate / self.speed
+            if self.speed > 0
+            else 0.0
+        )
+        started = time.perf_counter()
+        first_chunk = self.chunks
+        while not self._stopped.is_set():
+            if self.max_chunks is not None and self.chunks >= self.max_chunks:
+                break
+            # A real device delivers a chunk once it has been filled
+            deadline = started + (self.chunks - first_chunk + 1) * interval
+            now = time.perf_counter()
+            if deadline > now:
+                time.sleep(deadline - now)
+            data = self.read_chunk(self.frames_per_buffer)
+            if not data:
+                break
+            called = time.perf_counter()
+            _, flag = self.callback(
+                data,
+                self.frames_per_buffer,
+                {"input_buffer_adc_time": deadline, "current_time": called},
+                0,
+            )
+            returned = time.perf_counter()
+            if interval:
+                self.lateness.append(max(0.0, called - deadline))
+            self.durations.append(returned - called)
+            self.chunks += 1
+            if flag != PA_CONTINUE:
+                break
+        self.finished.set()
+
+
+class ToneBackend(CaptureBackend):
+    """
+    Synthetic sine tone source. The mic stream gets a tone an octave above
+    the speaker stream so the two are distinguishable when mixed.
+    """
+
+    def __init__(
+        self,
+        frequency: int = 440,
+        channels: int = 2,
+        rate: int = 48000,
+        sample_width: int = 3,
+        speed: float = 1.0,
+        duration: Optional[float] = None,
+    ):
+        self.frequency = frequency
+        self.channels = channels
+        self.rate = rate
+        self.sample_width = sample_width
+        self.speed = speed
+        self.duration = duration
+        self.streams: List[ReplayStream] = []
+
+    def _tone(self, frequency: int) -> bytes:
+        """One second of the tone as interleaved little-endian PCM"""
+        t = np.arange(self.rate) / self.rate
+        peak = 2 ** (8 * self.sample_width - 1) - 1
+        samples = (0.25 * peak * np.sin(2 * np.pi * frequency * t)).astype(
+            "<i4"
+        )
+        frames = np.repeat(samples, self.channels)
+        # Keep the low `sample_width` bytes of each 32-bit sample
+        return (
+            frames.view(np.uint8)
+            .reshape(-1, 4)[:, : self.sample_width]
+            .tobytes()
+        )
+
+    def open_stream(
+        self, callback: Callback, frames_per_buffer: int, loopback: bool
+    ) -> ReplayStream:
+        tone = self._tone(self.frequency if loopback else 2 * self.frequency)
+        frame_size = self.channels * self.sample_width
+        chunk_size = frames_per_buffer * frame_size
+        # Pad so a chunk can wrap around the end of the one-second loop
+        looped = tone + tone[:chunk_size]
+        position = 0
+
+        def read_chunk(frame_count: int) -> bytes:
+            nonlocal position
+            chunk = looped[position : position + chunk_size]
+            position = (position + chunk_size) % len(tone)
+            return chunk
+
+        stream = ReplayStream(
+            read_chunk,
+            callback,
+            frames_per_buffer,
+            self.rate,
+            self.speed,
+            self.duration,
+        )
+        self.streams.append(stream)
+        return stream
+
+
+class WavReplayBackend(CaptureBackend):
+    """
+    Replays WAV recordings as if they were being captured live. The mic
+    stream replays `mic_path` if given, otherwise `path`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mic_path: Optional[str] = None,
+        speed: float = 1.0,
+        loop: bool = False,
+        duration: Optional[float] = None,
+    ):
+        self.path = path
+        self.mic_path = mic_path or path
+        self.speed = speed
+        self.loop = loop
+        self.duration = duration
+        self.streams: List[ReplayStream] = []
+        self._files: List[wave.Wave_read] = []
+        with wave.open(path, "rb") as wav:
+            self.channels = wav.getnchannels()
+            self.rate = wav.getframerate()
+            self.sample_width = wav.getsampwidth()
+
+    def open_stream(
+        self, callback: Callback, frames_per_buffer: int, loopback: bool
+    ) -> ReplayStream:
+        wav = wave.open(self.path if loopback else self.mic_path, "rb")
+        if (
+            wav.getnchannels(),
+            wav.getframerate(),
+            wav.getsampwidth(),
+        ) != (self.channels, self.rate, self.sample_width):
+            wav.close()
+            raise ValueError("Speaker and mic recordings differ in format")
+        self._files.append(wav)
+        frame_size = self.channels * self.sample_width
+
+        def read_chunk(frame_count: int) -> bytes:
+            data = wav.readframes(frame_count)
+            if len(data) < frame_count * frame_size and self.loop:
+                wav.rewind()
+                data += wav.readframes(frame_count - len(data) // frame_size)
+            return data
+
+        stream = ReplayStream(
+            read_chunk,
+            callback,
+            frames_per_buffer,
+            self.rate,
+            self.speed,
+            self.duration,
+        )
+        self.streams.append(stream)
+        return stream
+
+    def terminate(self) -> None:
+        for wav in self._files:
+            wav.close()
+        self._files = []
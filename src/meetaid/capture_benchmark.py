@@ -0,0 +1,151 @@
+from typing import Dict, List
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import click
+import numpy as np
+
+from meetaid.audio_recorder import AudioRecorder
+from meetaid.capture import ToneBackend
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option("--hours", default=1.0, show_default=True, help="Session length")
+@click.option(
+    "--speed",
+    default=0.0,
+    show_default=True,
+    help="Capture pace: 1 is real-time, 0 is as fast as possible",
+)
+@click.option("--rate", default=48000, show_default=True)
+@click.option("--channels", default=2, show_default=True)
+@click.option(
+    "--audio-format",
+    type=click.Choice(["wav", "flac"]),
+    default="wav",
+    show_default=True,
+)
+@click.option(
+    "--output-dir",
+    default=None,
+    help="Where recordings are written (default: a temporary directory)",
+)
+def main(
+    hours: float,
+    speed: float,
+    rate: int,
+    channels: int,
+    audio_format: str,
+    output_dir: str,
+) -> None:
+    """Benchmark AudioRecorder's capture path with a synthetic source"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report = benchmark(
+            hours * 3600,
+            speed,
+            rate,
+            channels,
+            output_dir or tmp_dir,
+            audio_format,
+        )
+    for name, value in report.items():
+        click.echo(f"{name:>28}: {value:.6g}")
+
+
+def benchmark(
+    duration: float,
+    speed: float = 0.0,
+    rate: int = 48000,
+    channels: int = 2,
+    output_dir: str = "output",
+    audio_format: str = "wav",
+) -> Dict[str, float]:
+    """
+    Record a synthetic session and measure the capture path.
+
+    Args:
+        duration: Length of the simulated session in seconds.
+        speed: Capture pace, 1.0 is real-time and 0 is as fast as possible.
+        rate: Sample rate of the synthetic source.
+        channels: Channel count of the synthetic source.
+        output_dir: Where the recordings are written.
+        audio_format: "wav" or "flac".
+
+    Returns:
+        Callback latency percentiles in milliseconds, peak queue depth
+        and the time `stop_recording` takes to write the files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    backend = ToneBackend(
+        channels=channels, rate=rate, speed=speed, duration=duration
+    )
+    recorder = AudioRecorder(
+        backend=backend, output_dir=output_dir, audio_format=audio_format
+    )
+
+    depths: List[int] = []
+    sampling = threading.Event()
+
+    def sample_queue_depth() -> None:
+        while not sampling.wait(0.05):
+            depths.append(recorder.spkr_queue.qsize())
+
+    logger.info(f"Recording {duration:.0f}s of synthetic audio")
+    started = time.perf_counter()
+    recorder.start_recording("benchmark")
+    sampler = threading.Thread(target=sample_queue_depth, daemon=True)
+    sampler.start()
+    for stream in backend.streams:
+        stream.finished.wait()
+    capture_time = time.perf_counter() - started
+    sampling.set()
+    sampler.join()
+    depths.append(recorder.spkr_queue.qsize())
+
+    logger.info("Finalizing recording")
+    started = time.perf_counter()
+    combined_filename = recorder.stop_recording()
+    finalize_time = time.perf_counter() - started
+    recorder.terminate()
+
+    chunk_bytes = recorder.CHUNK_SIZE * channels * backend.sample_width
+    durations = np.concatenate(
+        [np.frombuffer(s.durations) for s in backend.streams]
+    )
+    lateness = np.concatenate(
+        [np.frombuffer(s.lateness) for s in backend.streams]
+    )
+    report = {
+        "callbacks": float(len(durations)),
+        "capture_time_s": capture_time,
+    }
+    for p in PERCENTILES:
+        report[f"callback_p{p}_ms"] = np.percentile(durations, p) * 1000
+    report["callback_max_ms"] = durations.max() * 1000
+    if len(lateness):
+        for p in PERCENTILES:
+            report[f"lateness_p{p}_ms"] = np.percentile(lateness, p) * 1000
+        report["lateness_max_ms"] = lateness.max() * 1000
+    report["max_queue_depth_chunks"] = float(max(depths))
+    report["max_queue_depth_mb"] = max(depths) * chunk_bytes / 2**20
+    report["finalize_time_s"] = finalize_time
+    report["output_mb"] = os.path.getsize(combined_filename) / 2**20
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Lossless FLAC encoding of audio while it is being recorded."""
+from typing import List, Optional, Tuple
+
+import logging
+import os
+import threading
+import time
+import wave
+from queue import Empty, Queue
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# FLAC subtype for each PCM sample width in bytes
+SUBTYPES = {2: "PCM_16", 3: "PCM_24"}
+MAX_BATCH = 64  # chunks encoded per write
+MIX_BLOCK_FRAMES = 65536
+RETRY_SECONDS = 1.0  # wait between attempts after a failed write
+FINAL_ATTEMPTS = 3  # attempts at the last batch once recording stopped
+
+
+def pcm_to_array(data: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """
+    Convert interleaved little-endian PCM to a (frames, channels) array
+    that soundfile writes losslessly at `sample_width`.
+
+    24-bit samples are placed in the top three bytes of an int32, which
+    soundfile scales back down to 24 bits.
+    """
+    if sample_width == 2:
+        samples = np.frombuffer(data, dtype="<i2")
+    elif sample_width == 3:
+        padded = np.zeros((len(data) // 3, 4), dtype=np.uint8)
+        padded[:, 1:] = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = padded.view("<i4").ravel()
+    else:
+        raise ValueError(f"FLAC encoding of {sample_width * 8}-bit audio")
+    return samples.reshape(-1, channels)
+
+
+class FlacEncoder(threading.Thread):
+    """
+    Encodes the chunks put on a queue to a FLAC file as they arrive, so the
+    recording never has to be held in memory or written out raw. Put None
+    on the queue, or call `finish`, to close the file.
+
+    If a write fails (e.g. the disk is briefly full) the FLAC written so
+    far is kept, the queue keeps being drained and the rest of the
+    recording is written to WAV parts, which `finish` joins back into
+    `filename`.
+    """
+
+    def __init__(
+        self,
+        queue: Queue[Optional[bytes]],
+        filename: str,
+        channels: int,
+        rate: int,
+        sample_width: int,
+    ):
+        super().__init__(daemon=True)
+        if sample_width not in SUBTYPES:
+            raise ValueError(f"FLAC encoding of {sample_width * 8}-bit audio")
+        self.queue = queue
+        self.filename = filename
+        self.channels = channels
+        self.rate = rate
+        self.sample_width = sample_width
+        self.frames = 0
+        self.error: Optional[Exception] = None
+        # Files the recording was written to and the frames in each
+        self.parts: List[str] = [filename]
+        self.part_frames: List[int] = [0]
+        self.file: Optional[sf.SoundFile] = sf.SoundFile(
+            filename,
+            "w",
+            samplerate=rate,
+            channels=channels,
+            format="FLAC",
+            subtype=SUBTYPES[sample_width],
+        )
+        self.fallback: Optional[wave.Wave_write] = None
+
+    def run(self) -> None:
+        done = False
+        batch: List[bytes] = []
+        attempts = 0
+        while batch or not done:
+            if not batch:
+                batch, done = self._next_batch()
+                continue
+            try:
+                self._write(b"".join(batch))
+            except Exception as e:
+                self.error = e
+                attempts += 1
+                logger.error(f"Writing {self.parts[-1]} failed: {e}")
+                self._close_part()
+                if done and attempts >= FINAL_ATTEMPTS:
+                    logger.error(f"Dropped the last {len(batch)} chunk(s)")
+                    break
+                if attempts > 1:
+                    time.sleep(RETRY_SECONDS)
+                continue
+            batch = []
+            attempts = 0
+        self._close_part()
+
+    def _next_batch(self) -> Tuple[List[bytes], bool]:
+        """Chunks that have arrived, and whether the recording stopped"""
+        batch: List[Optional[bytes]] = [self.queue.get()]
+        # Encode whatever else has arrived in one write
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        if None in batch:
+            chunks = batch[: batch.index(None)]
+            return [chunk for chunk in chunks if chunk is not None], True
+        return [chunk for chunk in batch if chunk is not None], False
+
+    def _write(self, data: bytes) -> None:
+        frames = len(data) // (self.channels * self.sample_width)
+        if self.file is not None:
+            self.file.write(
+                pcm_to_array(data, self.sample_width, self.channels)
+            )
+        else:
+            if self.fallback is None:
+                root, _ = os.path.splitext(self.filename)
+                part = f"{root}.part{len(self.parts)}.wav"
+                logger.warning(f"Continuing the recording in {part}")
+                self.parts.append(part)
+                self.part_frames.append(0)
+                self.fallback = wave.open(part, "wb")
+                self.fallback.setnchannels(self.channels)
+                self.fallback.setsampwidth(self.sample_width)
+                self.fallback.setframerate(self.rate)
+            self.fallback.writeframes(data)
+        self.frames += frames
+        self.part_frames[-1] += frames
+
+    def _close_part(self) -> None:
+        """Close the file being written; later writes go to a new part"""
+        for file in (self.file, self.fallback):
+            if file is not None:
+                try:
+                    file.close()
+                except Exception as e:
+                    logger.error(f"Closing {self.parts[-1]} failed: {e}")
+        self.file = None
+        self.fallback = None
+
+    def finish(self) -> int:
+        """
+        Encode what is left on the queue, close the file and join any
+        fallback parts into it.
+
+        Returns:
+            The number of frames written.
+        """
+        self.queue.put(None)
+        self.join()
+        parts = [
+            part
+            for part, frames in zip(self.parts, self.part_frames)
+            if frames > 0
+        ]
+        for part in self.parts[1:]:
+            if part not in parts and os.path.exists(part):
+                os.remove(part)
+        if parts and parts != [self.filename]:
+            if parts[0] == self.filename:
+                root, ext = os.path.splitext(self.filename)
+                parts[0] = f"{root}.part0{ext}"
+                os.replace(self.filename, parts[0])
+            concat_files(parts, self.filename)
+            for part in parts:
+                os.remove(part)
+        return self.frames
+
+
+def concat_files(filenames: List[str], output_filename: str) -> None:
+    """
+    Join audio files with the same rate, channels and sample width, one
+    after the other, block by block into a FLAC file.
+    """
+    first = sf.info(filenames[0])
+    with sf.SoundFile(
+        output_filename,
+        "w",
+        samplerate=first.samplerate,
+        channels=first.channels,
+        format="FLAC",
+        subtype=first.subtype,
+    ) as output:
+        for filename in filenames:
+            with sf.SoundFile(filename) as part:
+                for block in part.blocks(
+                    MIX_BLOCK_FRAMES, dtype="int32", always_2d=True
+                ):
+                    output.write(block)
+
+
+def mix_files(filenames: List[str], output_filename: str) -> None:
+    """
+    Mix (sum, with clipping) audio files of the same format block by block
+    into a FLAC file, padding shorter files with silence.
+    """
+    inputs = [sf.SoundFile(filename) for filename in filenames]
+    try:
+        first = inputs[0]
+        with sf.SoundFile(
+            output_filename,
+            "w",
+            samplerate=first.samplerate,
+            channels=first.channels,
+            format="FLAC",
+            subtype=first.subtype,
+        ) as output:
+            while True:
+                blocks = [
+                    f.read(MIX_BLOCK_FRAMES, dtype="int32", always_2d=True)
+                    for f in inputs
+                ]
+                frames = max(len(block) for block in blocks)
+                if frames == 0:
+                    break
+                mixed = np.zeros((frames, first.channels), dtype=np.int64)
+                for block in blocks:
+                    mixed[: len(block)] += block
+                info = np.iinfo(np.int32)
+                output.write(
+                    np.clip(mixed, info.min, info.max).astype(np.int32)
+                )
+    finally:
+        for f in inputs:
+            f.close()
@@ -0,0 +1,262 @@
+"""Keep background processing from starving a live recording.
+
+`Recorder` marks a recording as active with a flag file. Processing jobs
+(`transcriber`, `reader`) run under a `ResourceGovernor` that caps their
+thread counts and worker pools and lowers their priority. As soon as a
+recording starts it drops every thread of the job to the lowest
+scheduling priority, even in the middle of a long step. At each checkpoint
+between units of work it also drops to a single thread or pauses until
+the recording ends, and it enforces a memory budget.
+"""
+from typing import Any, Callable, Optional
+
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import click
+import psutil
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FLAG = "output/.recording"
+# Leave half the cores to the recorder and the rest of the system
+MAX_THREADS = max(1, (os.cpu_count() or 2) // 2)
+POLL_SECONDS = 1.0
+PAUSE = "pause"
+THROTTLE = "throttle"
+BELOW_NORMAL_NICE = 10
+LOWEST_NICE = 19
+
+
+class ResourceBudgetExceeded(Exception):
+    """Processing used more memory than its budget allows"""
+
+
+def set_recording(active: bool, flag_loc: str = RECORDING_FLAG) -> None:
+    """
+    Mark a recording as active (or no longer active) for processing jobs
+    on this machine.
+
+    Args:
+        active: Whether a recording is in progress.
+        flag_loc: Path of the flag file.
+    """
+    flag = Path(flag_loc)
+    if active:
+        flag.parent.mkdir(parents=True, exist_ok=True)
+        flag.write_text(str(os.getpid()))
+    elif flag.exists():
+        flag.unlink()
+
+
+def recording_active(flag_loc: str = RECORDING_FLAG) -> bool:
+    """Whether a live recording is in progress (ignoring stale flags)"""
+    try:
+        pid = int(Path(flag_loc).read_text())
+    except (OSError, ValueError):
+        return False
+    return bool(psutil.pid_exists(pid))
+
+
+class ResourceGovernor:
+    """
+    Limits the resources a processing job takes from the machine.
+
+    Args:
+        max_threads: Cap for torch and OpenCV threads and worker pools.
+        memory_budget_mb: Resident memory the job may use, None for no
+            limit.
+        lower_priority: Run the job at below-normal priority.
+        while_recording: PAUSE to stop at the next checkpoint until the
+            recording ends, THROTTLE to keep going on a single thread.
+            Either way, once applied the job runs at the lowest priority
+            while recording.
+        recording_flag: Path of the flag file written by `set_recording`.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = MAX_THREADS,
+        memory_budget_mb: Optional[float] = None,
+        lower_priority: bool = True,
+        while_recording: str = PAUSE,
+        recording_flag: str = RECORDING_FLAG,
+    ):
+        if while_recording not in (PAUSE, THROTTLE):
+            raise ValueError(f"Unknown while_recording: {while_recording}")
+        self.max_threads = max(1, max_threads)
+        self.memory_budget_mb = memory_budget_mb
+        self.lower_priority = lower_priority
+        self.while_recording = while_recording
+        self.recording_flag = recording_flag
+        self.throttled = False
+        self.deprioritized = False
+        self.process = psutil.Process()
+        self._priority: Optional[int] = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def apply(self) -> "ResourceGovernor":
+        """
+        Apply the thread caps to the calling thread, which should be the
+        one doing the processing, lower the priority, and start watching
+        for recordings to deprioritize processing while they run.
+        """
+        self._set_threads(self.max_threads)
+        if self.lower_priority:
+            try:
+                if sys.platform == "win32":
+                    self.process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+                else:
+                    self.process.nice(BELOW_NORMAL_NICE)
+            except psutil.AccessDenied:
+                logger.warning("Could not lower the processing priority")
+        logger.info(f"Processing limited to {self.max_threads} thread(s)")
+        if self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop watching for recordings and restore the priority"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        if self.deprioritized:
+            self._restore_priority()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(POLL_SECONDS):
+            self._update_priority()
+
+    def _update_priority(self) -> None:
+        """Lower or restore the priority to match the recording state"""
+        active = recording_active(self.recording_flag)
+        if active and not self.deprioritized:
+            logger.info("Recording in progress, deprioritizing processing")
+            self._priority = self.process.nice()
+            lowest = (
+                psutil.IDLE_PRIORITY_CLASS
+                if sys.platform == "win32"
+                else LOWEST_NICE
+            )
+            try:
+                self._set_priority(lowest)
+            except (psutil.Error, OSError):
+                logger.warning("Could not lower the processing priority")
+            self.deprioritized = True
+        elif not active and self.deprioritized:
+            logger.info("Recording finished, restoring processing priority")
+            self._restore_priority()
+
+    def _restore_priority(self) -> None:
+        try:
+            if self._priority is not None:
+                self._set_priority(self._priority)
+        except (psutil.Error, OSError):
+            # Raising priority again may need privileges
+            logger.warning("Could not restore the processing priority")
+        self.deprioritized = False
+
+    def _set_priority(self, priority: int) -> None:
+        if sys.platform.startswith("linux"):
+            # Linux schedules each thread by its own nice value
+            for thread in self.process.threads():
+                try:
+                    os.setpriority(os.PRIO_PROCESS, thread.id, priority)
+                except ProcessLookupError:  # The thread has finished
+                    pass
+        else:
+            self.process.nice(priority)
+
+    def _update_throttle(self) -> bool:
+        """Throttle or restore threads to match the recording state"""
+        active = recording_active(self.recording_flag)
+        if active and not self.throttled:
+            logger.info("Recording in progress, throttling processing")
+            self._set_threads(1)
+            self.throttled = True
+        elif not active and self.throttled:
+            logger.info("Recording finished, restoring processing threads")
+            self._set_threads(self.max_threads)
+            self.throttled = False
+        return active
+
+    def workers(self, requested: int) -> int:
+        """Cap a requested worker pool size"""
+        return max(1, min(requested, self.max_threads))
+
+    def checkpoint(self) -> None:
+        """
+        Call between units of work, from the processing thread. Pauses or
+        throttles while a recording is active and checks the memory
+        budget.
+
+        Raises:
+            ResourceBudgetExceeded: If memory use is over budget even
+                after garbage collection.
+        """
+        if self._update_throttle() and self.while_recording == PAUSE:
+            logger.info("Recording in progress, pausing processing")
+            while recording_active(self.recording_flag):
+                time.sleep(POLL_SECONDS)
+            logger.info("Recording finished, resuming processing")
+            self._update_throttle()
+        self._check_memory()
+
+    def _check_memory(self) -> None:
+        if self.memory_budget_mb is None:
+            return
+        if self._rss_mb() > self.memory_budget_mb:
+            gc.collect()
+            rss_mb = self._rss_mb()
+            if rss_mb > self.memory_budget_mb:
+                raise ResourceBudgetExceeded(
+                    f"Using {rss_mb:.0f} MB, budget is "
+                    f"{self.memory_budget_mb:.0f} MB"
+                )
+
+    def _rss_mb(self) -> float:
+        return float(self.process.memory_info().rss / 2**20)
+
+    @staticmethod
+    def _set_threads(threads: int) -> None:
+        # Thread counts apply to the calling thread (torch) or process
+        # (OpenCV). Only touch libraries the job has already imported
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(threads)
+        cv2 = sys.modules.get("cv2")
+        if cv2 is not None:
+            cv2.setNumThreads(threads)
+
+
+def governor_options(command: Callable[..., Any]) -> Callable[..., Any]:
+    """Add options to a click command to configure its ResourceGovernor"""
+    command = click.option(
+        "--while-recording",
+        type=click.Choice([PAUSE, THROTTLE]),
+        default=PAUSE,
+        show_default=True,
+        help="What to do while a recording is in progress",
+    )(command)
+    command = click.option(
+        "--memory-budget",
+        type=float,
+        default=None,
+        help="Memory budget in MB",
+    )(command)
+    command = click.option(
+        "--max-threads",
+        default=MAX_THREADS,
+        show_default=True,
+        help="Threads and worker processes to use at most",
+    )(command)
+    return command
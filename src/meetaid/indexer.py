@@ -0,0 +1,360 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import ast
+import logging
+import os
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import click
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+INDEX_DB = "output/meetaid.db"
+TRANSCRIPT_HEADER = "Transcript:"
+VIDEO_TEXT_HEADER = "Video Text:"
+SOURCE_TRANSCRIPT = "transcript"
+SOURCE_VIDEO = "video"
+
+# [0:00:05-0:00:10] SPEAKER_00: Hello there
+TRANSCRIPT_LINE = re.compile(
+    r"^\[(?P<start>[\d:.]+)-(?P<end>[\d:.]+)\] "
+    r"(?P<speaker>[^:]+): (?P<text>.*)$"
+)
+# [00:00:00.000-00:00:05.000]:  ['Agenda', 'Q3 results']
+VIDEO_LINE = re.compile(
+    r"^\[(?P<start>[\d:.]+)-(?P<end>[\d:.]+)\]:\s+(?P<text>.*)$"
+)
+# audio_20231202-092450.txt / video_20231202-092450.txt
+MEETING_ID = re.compile(r"(\d{8}-\d{6})")
+# A parenthesis, a "quoted phrase" or any other run of non-space characters
+QUERY_TOKEN = re.compile(r'[()]|"[^"]*"|[^\s"()]+')
+QUERY_OPERATORS = ("(", ")", "AND", "OR", "NOT")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    meeting_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS moments USING fts5(
+    text,
+    meeting_id UNINDEXED,
+    source UNINDEXED,
+    speaker UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    path UNINDEXED
+);
+"""
+
+
+@click.group(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--db", "db_loc", default=INDEX_DB, show_default=True, help="Index file"
+)
+@click.pass_context
+def main(ctx: click.Context, db_loc: str) -> None:
+    """Index and search meeting transcripts and video text"""
+    ctx.obj = db_loc
+
+
+@main.command("index")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.pass_obj
+def index_command(db_loc: str, paths: Tuple[str, ...]) -> None:
+    """Index transcript and video text files (or directories of them)"""
+    with closing(connect(db_loc)) as conn:
+        for path in paths:
+            indexed = index_path(conn, path)
+            logger.info(f"Indexed {indexed} new or changed file(s) in {path}")
+
+
+@main.command("search")
+@click.argument("query")
+@click.option("--limit", default=20, show_default=True, help="Max results")
+@click.pass_obj
+def search_command(db_loc: str, query: str, limit: int) -> None:
+    """Search the index for matching moments"""
+    with closing(connect(db_loc)) as conn:
+        try:
+            hits = search(conn, query, limit=limit)
+        except sqlite3.OperationalError as e:
+            raise click.ClickException(
+                f'Invalid query {query!r} ({e}). Use words, "quoted'
+                ' phrases", prefix* and AND/OR/NOT.'
+            )
+        for hit in hits:
+            speaker = f" {hit['speaker']}" if hit["speaker"] else ""
+            click.echo(
+                f"{hit['meeting_id']} [{format_seconds(hit['start'])}-"
+                f"{format_seconds(hit['end'])}] {hit['source']}{speaker}: "
+                f"{hit['snippet']}"
+            )
+
+
+def connect(db_loc: str) -> sqlite3.Connection:
+    """
+    Open (and create if needed) the search index.
+
+    Args:
+        db_loc: Path to the SQLite index file, or ":memory:".
+
+    Returns:
+        An open connection with the index schema in place.
+    """
+    if db_loc != ":memory:":
+        Path(db_loc).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_loc)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def index_output(file_loc: str, db_loc: str = INDEX_DB) -> None:
+    """
+    Add a newly written transcript or video text file to the index.
+
+    Args:
+        file_loc: Path to the text file.
+        db_loc: Path to the SQLite index file.
+    """
+    with closing(connect(db_loc)) as conn:
+        index_file(conn, file_loc)
+
+
+def index_path(conn: sqlite3.Connection, path: str) -> int:
+    """
+    Index a text file, or every text file under a directory. Files that
+    have not changed since they were last indexed are skipped.
+
+    Args:
+        conn: Connection returned by `connect`.
+        path: A transcript/video text file or a directory containing them.
+
+    Returns:
+        The number of files that were (re)indexed.
+    """
+    path_obj = Path(path)
+    if path_obj.is_dir():
+        files = sorted(path_obj.rglob("*.txt"))
+    else:
+        files = [path_obj]
+    indexed = 0
+    for file in files:
+        if index_file(conn, str(file)):
+            indexed += 1
+    return indexed
+
+
+def index_file(conn: sqlite3.Connection, file_loc: str) -> bool:
+    """
+    Index a single transcript or video text file written by `transcriber`
+    or `reader`.
+
+    Args:
+        conn: Connection returned by `connect`.
+        file_loc: Path to the text file.
+
+    Returns:
+        True if the file was (re)indexed, False if it was unchanged or is
+        not a meetaid output file.
+    """
+    file_loc = os.path.abspath(file_loc)
+    stat = os.stat(file_loc)
+    row = conn.execute(
+        "SELECT mtime, size FROM documents WHERE path = ?", (file_loc,)
+    ).fetchone()
+    if row is not None and (row["mtime"], row["size"]) == (
+        stat.st_mtime,
+        stat.st_size,
+    ):
+        return False
+
+    with open(file_loc) as file:
+        content = file.read()
+    parsed = parse_output(content)
+    if parsed is None:
+        logger.debug(f"Skipping {file_loc}: not a transcript or video text")
+        return False
+    source, segments = parsed
+    meeting_id = get_meeting_id(file_loc)
+
+    with conn:
+        conn.execute("DELETE FROM moments WHERE path = ?", (file_loc,))
+        conn.execute("DELETE FROM documents WHERE path = ?", (file_loc,))
+        add_segments(conn, meeting_id, source, segments, file_loc)
+        conn.execute(
+            "INSERT INTO documents (path, meeting_id, source, mtime, size)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (file_loc, meeting_id, source, stat.st_mtime, stat.st_size),
+        )
+    return True
+
+
+def add_segments(
+    conn: sqlite3.Connection,
+    meeting_id: str,
+    source: str,
+    segments: List[Dict[str, Any]],
+    path: str = "",
+) -> None:
+    """
+    Add segments to the index.
+
+    Args:
+        conn: Connection returned by `connect`.
+        meeting_id: Identifier of the meeting the segments belong to.
+        source: SOURCE_TRANSCRIPT or SOURCE_VIDEO.
+        segments: Dictionaries with "start", "end" (seconds), "text" and
+            optionally "speaker", as returned by
+            `transcriber.assign_speakers`.
+        path: File the segments came from, if any.
+    """
+    conn.executemany(
+        "INSERT INTO moments (text, meeting_id, source, speaker, start, end,"
+        " path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                seg["text"].strip(),
+                meeting_id,
+                source,
+                seg.get("speaker", ""),
+                float(seg["start"]),
+                float(seg["end"]),
+                path,
+            )
+            for seg in segments
+            if seg["text"].strip()
+        ],
+    )
+
+
+def search(
+    conn: sqlite3.Connection, query: str, limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Search the index.
+
+    Args:
+        conn: Connection returned by `connect`.
+        query: Words, "quoted phrases", prefixes (`budg*`) and the
+            AND/OR/NOT operators, e.g. `Q3-results OR "action items"`.
+            See `quote_query`.
+        limit: Maximum number of results to return.
+
+    Returns:
+        A list of matching moments, best match first.
+
+    Raises:
+        sqlite3.OperationalError: If the query is still not valid FTS5,
+            e.g. it ends with an operator.
+    """
+    rows = conn.execute(
+        "SELECT meeting_id, source, speaker, start, end, path, text,"
+        " snippet(moments, 0, '[', ']', '...', 12) AS snippet"
+        " FROM moments WHERE moments MATCH ? ORDER BY rank LIMIT ?",
+        (quote_query(query), limit),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def quote_query(query: str) -> str:
+    """
+    Quote each plain term of a search query as an FTS5 string, so that
+    punctuation in ordinary input (`Q3-results`, `what's`) is not read as
+    FTS5 syntax. Quoted phrases, a trailing `*` for prefix search,
+    parentheses and the AND/OR/NOT operators keep their meaning.
+    """
+    quoted = []
+    for token in QUERY_TOKEN.findall(query):
+        if token.startswith('"') or token in QUERY_OPERATORS:
+            quoted.append(token)
+        elif token.rstrip("*"):
+            prefix = "*" if token.endswith("*") else ""
+            quoted.append(f'"{token.rstrip("*")}"{prefix}')
+    return " ".join(quoted)
+
+
+def parse_output(
+    content: str,
+) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Parse the text written by `transcriber.transcribe` or `reader.read`.
+
+    Args:
+        content: Contents of the text file.
+
+    Returns:
+        A (source, segments) tuple, or None if the content is not
+        recognized.
+    """
+    if content.startswith(TRANSCRIPT_HEADER):
+        return SOURCE_TRANSCRIPT, list(_parse_transcript(content))
+    if content.startswith(VIDEO_TEXT_HEADER):
+        return SOURCE_VIDEO, list(_parse_video_text(content))
+    return None
+
+
+def _parse_transcript(content: str) -> Iterator[Dict[str, Any]]:
+    for line in content.splitlines():
+        match = TRANSCRIPT_LINE.match(line)
+        if match:
+            yield {
+                "start": parse_timecode(match["start"]),
+                "end": parse_timecode(match["end"]),
+                "speaker": match["speaker"],
+                "text": match["text"],
+            }
+
+
+def _parse_video_text(content: str) -> Iterator[Dict[str, Any]]:
+    for line in content.splitlines():
+        match = VIDEO_LINE.match(line)
+        if match:
+            text = match["text"]
+            try:
+                text = " ".join(ast.literal_eval(text))
+            except (ValueError, SyntaxError, TypeError):
+                pass
+            yield {
+                "start": parse_timecode(match["start"]),
+                "end": parse_timecode(match["end"]),
+                "text": text,
+            }
+
+
+def parse_timecode(timecode: str) -> float:
+    """Convert "H:MM:SS" or "HH:MM:SS.mmm" to seconds"""
+    seconds = 0.0
+    for part in timecode.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_seconds(seconds: float) -> str:
+    """Convert seconds to "H:MM:SS" """
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{secs:02}"
+
+
+def get_meeting_id(file_loc: str) -> str:
+    """Meeting ID from a recording's file name, e.g. 20231202-092450"""
+    name = Path(file_loc).stem
+    match = MEETING_ID.search(name)
+    return match.group(1) if match else name
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Reuse OCR results across scenes and meetings.
+
+Scene frames are keyed by a difference hash (dHash) so a slide or screen
+that comes back, in the same meeting or a later one, is not read again.
+The hash only finds candidates: slides from the same template can differ
+by a bit or two while their text differs, so a candidate is reused only if
+a grayscale thumbnail stored with it shows no changed regions. Frames that
+only partly changed since the previous scene are re-read only in the
+changed regions.
+"""
+from typing import List, Optional, Sequence, Tuple, cast
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE = "output/ocr_cache.db"
+HASH_SIZE = 16  # 16x16 gradients, a 256 bit hash
+MAX_HASH_DISTANCE = 4  # bits that may differ for a frame to be a candidate
+THUMBNAIL_WIDTH = 480  # keeps changed words visible, averages out noise
+DIFF_THRESHOLD = 32  # gray level change that counts as a changed pixel
+REGION_PADDING = 8  # pixels added around changed regions
+# Ignore changes with a smaller bounding box (noise, a mouse cursor) unless
+# they touch text that was read before
+MIN_REGION_AREA = 64
+MAX_CHANGED_FRACTION = 0.5  # above this, read the whole frame instead
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+OCRResult = Tuple[Box, str]
+
+
+def dhash(image: np.ndarray, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash of an image: one bit per horizontally adjacent pair of
+    pixels in a downscaled grayscale copy.
+
+    Args:
+        image: BGR or grayscale image.
+        hash_size: Width and height of the gradient grid.
+
+    Returns:
+        The hash as an int of hash_size ** 2 bits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(
+        image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA
+    )
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def thumbnail(image: np.ndarray, width: int = THUMBNAIL_WIDTH) -> np.ndarray:
+    """Grayscale copy of an image scaled down to `width` pixels wide"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of bits that differ between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class OCRCache:
+    """Persistent map of frames to their OCR results"""
+
+    def __init__(
+        self,
+        cache_loc: str = OCR_CACHE,
+        max_distance: int = MAX_HASH_DISTANCE,
+    ):
+        if cache_loc != ":memory:":
+            Path(cache_loc).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(cache_loc)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache (id INTEGER PRIMARY KEY,"
+            " hash TEXT NOT NULL, thumbnail BLOB NOT NULL,"
+            " results TEXT NOT NULL)"
+        )
+        self.max_distance = max_distance
+        # Hash, row id and results of each entry; thumbnails stay on disk
+        self.entries: List[Tuple[int, int, List[OCRResult]]] = [
+            (int(hash_hex, 16), row_id, _load_results(results))
+            for row_id, hash_hex, results in self.conn.execute(
+                "SELECT id, hash, results FROM ocr_cache"
+            )
+        ]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, frame: np.ndarray) -> Optional[List[OCRResult]]:
+        """
+        Look up the results of a frame that has been read before.
+
+        Args:
+            frame: The scene image (BGR).
+
+        Returns:
+            The results of a cached frame whose hash is within
+            `max_distance` bits and whose thumbnail differs at most by
+            small changes away from its text (see `changed_regions`), else
+            None.
+        """
+        frame_hash = dhash(frame)
+        candidates = sorted(
+            (hamming(frame_hash, cached_hash), row_id, cached_results)
+            for cached_hash, row_id, cached_results in self.entries
+        )
+        frame_thumbnail = thumbnail(frame)
+        scale = frame_thumbnail.shape[1] / frame.shape[1]
+        for distance, row_id, cached_results in candidates:
+            if distance > self.max_distance:
+                break
+            text_boxes = [
+                (
+                    int(left * scale),
+                    int(top * scale),
+                    int(right * scale) + 1,
+                    int(bottom * scale) + 1,
+                )
+                for (left, top, right, bottom), _ in cached_results
+            ]
+            if self._same_thumbnail(row_id, frame_thumbnail, text_boxes):
+                self.hits += 1
+                return cached_results
+        self.misses += 1
+        return None
+
+    def _same_thumbnail(
+        self,
+        row_id: int,
+        frame_thumbnail: np.ndarray,
+        text_boxes: Sequence[Box],
+    ) -> bool:
+        (blob,) = self.conn.execute(
+            "SELECT thumbnail FROM ocr_cache WHERE id = ?", (row_id,)
+        ).fetchone()
+        cached = cv2.imdecode(
+            np.frombuffer(blob, np.uint8), cv2.IMREAD_GRAYSCALE
+        )
+        return (
+            cached is not None
+            and cached.shape == frame_thumbnail.shape
+            and not changed_regions(
+                cached, frame_thumbnail, text_boxes=text_boxes
+            )
+        )
+
+    def put(self, frame: np.ndarray, results: List[OCRResult]) -> None:
+        """Store the OCR results of a frame"""
+        frame_hash = dhash(frame)
+        _, png = cv2.imencode(".png", thumbnail(frame))
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO ocr_cache (hash, thumbnail, results)"
+                " VALUES (?, ?, ?)",
+                (f"{frame_hash:x}", png.tobytes(), json.dumps(results)),
+            )
+        self.entries.append((frame_hash, cast(int, cursor.lastrowid), results))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _load_results(results: str) -> List[OCRResult]:
+    return [(tuple(box), text) for box, text in json.loads(results)]
+
+
+def changed_regions(
+    previous: np.ndarray,
+    current: np.ndarray,
+    threshold: int = DIFF_THRESHOLD,
+    padding: int = REGION_PADDING,
+    min_area: int = MIN_REGION_AREA,
+    text_boxes: Sequence[Box] = (),
+) -> List[Box]:
+    """
+    Bounding boxes of the areas that differ between two frames.
+
+    Args:
+        previous: Frame of the previous scene, BGR or grayscale.
+        current: Frame of the current scene, same shape as `previous`.
+        threshold: Gray level change that counts as a changed pixel.
+        padding: Pixels added around (and used to join) nearby changes.
+        min_area: Changes with a smaller bounding box, before padding,
+            are ignored unless they overlap one of `text_boxes`.
+        text_boxes: Boxes of text read from `previous`, in which even the
+            smallest change (e.g. 12% to 21%) counts.
+
+    Returns:
+        A list of (left, top, right, bottom) boxes.
+    """
+    if previous.ndim == 3:
+        previous = cv2.cvtColor(previous, cv2.COLOR_BGR2GRAY)
+        current = cv2.cvtColor(current, cv2.COLOR_BGR2GRAY)
+    diff = cv2.absdiff(previous, current)
+    _, mask = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask)
+    for label in range(1, count):
+        x, y, w, h = stats[label, :4]
+        box = (x, y, x + w, y + h)
+        if w * h < min_area and not any(
+            _overlaps(box, text_box) for text_box in text_boxes
+        ):
+            mask[labels == label] = 0
+    mask = cv2.dilate(mask, np.ones((2 * padding + 1,) * 2, np.uint8))
+    contours, _ = cv2.findContours(
+        mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        regions.append((x, y, x + w, y + h))
+    return regions
+
+
+def changed_fraction(regions: Sequence[Box], shape: Tuple[int, ...]) -> float:
+    """Fraction of the frame covered by the changed regions"""
+    area = sum((r - left) * (b - top) for left, top, r, b in regions)
+    return area / (shape[0] * shape[1])
+
+
+def _overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a: Box, b: Box) -> Box:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def expand_regions(
+    regions: Sequence[Box], previous_results: Sequence[OCRResult]
+) -> List[Box]:
+    """
+    Grow changed regions to cover any previously read text they touch, so
+    partly changed lines are read again in full, and merge regions that
+    then overlap.
+    """
+    expanded: List[Box] = []
+    for region in regions:
+        for box, _ in previous_results:
+            if _overlaps(region, box):
+                region = _union(region, box)
+        expanded.append(region)
+    merged: List[Box] = []
+    for region in expanded:
+        i = 0
+        while i < len(merged):
+            if _overlaps(merged[i], region):
+                region = _union(merged.pop(i), region)
+                i = 0
+            else:
+                i += 1
+        merged.append(region)
+    return merged
+
+
+def merge_results(
+    previous_results: Sequence[OCRResult],
+    regions: Sequence[Box],
+    region_results: Sequence[OCRResult],
+) -> List[OCRResult]:
+    """
+    Replace the previous text inside the changed regions with the text read
+    from those regions, in reading order.
+    """
+    kept = [
+        result
+        for result in previous_results
+        if not any(_overlaps(result[0], region) for region in regions)
+    ]
+    return sorted(
+        kept + list(region_results),
+        key=lambda result: (result[0][1], result[0][0]),
+    )
@@ -0,0 +1,48 @@
+"""Host profile written by `meetaid.autotune` and read at startup."""
+from typing import Any, Dict
+
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILE = "output/profile.json"
+PROFILE_ENV = "MEETAID_PROFILE"  # overrides the profile location
+
+
+def profile_location() -> str:
+    return os.getenv(PROFILE_ENV, PROFILE)
+
+
+def load_profile(section: str) -> Dict[str, Any]:
+    """
+    Load a section ("transcriber" or "reader") of the host profile.
+
+    Args:
+        section: Name of the section.
+
+    Returns:
+        The section's settings, or an empty dict if there is no profile.
+    """
+    profile_loc = profile_location()
+    if not os.path.exists(profile_loc):
+        return {}
+    try:
+        with open(profile_loc) as file:
+            settings: Dict[str, Any] = json.load(file).get(section, {})
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring unreadable profile {profile_loc}: {e}")
+        return {}
+    logger.debug(f"Loaded {section} profile: {settings}")
+    return settings
+
+
+def save_profile(profile: Dict[str, Any]) -> str:
+    """Write the host profile, returning where it was written"""
+    profile_loc = profile_location()
+    Path(profile_loc).parent.mkdir(parents=True, exist_ok=True)
+    with open(profile_loc, "w") as file:
+        json.dump(profile, file, indent=2)
+    return profile_loc
@@ -1,14 +1,31 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import logging
 import os
 # from datetime import datetime
 
 import click
+import cv2
 import easyocr
-from scenedetect import ContentDetector, SceneManager, open_video
+import numpy as np
+from scenedetect import open_video
 from scenedetect.scene_manager import save_images
 
+from meetaid import indexer
+from meetaid.governor import ResourceGovernor, governor_options
+from meetaid.ocr_cache import (
+    MAX_CHANGED_FRACTION,
+    OCR_CACHE,
+    OCRCache,
+    OCRResult,
+    changed_fraction,
+    changed_regions,
+    expand_regions,
+    merge_results,
+)
+from meetaid.profile import load_profile
+from meetaid.scenes import detect_scenes
+
 # from meetaid.recorder import DT_FORMAT
 
 logging.basicConfig(
@@ -21,6 +38,14 @@ logger = logging.getLogger(__name__)
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 LANGUAGE = "en"
 HF_TOKEN = "HF_TOKEN"
+# Settings measured for this host by `python -m meetaid.autotune`, if run
+PROFILE = load_profile("reader")
+OCR_GPU = PROFILE.get("gpu", True)
+OCR_WORKERS = PROFILE.get("workers", 0)
+OCR_BATCH_SIZE = PROFILE.get("batch_size", 1)
+# VideoRecorder writes each captured frame 5 times, so skipping 4 of every
+# 5 frames loses nothing
+FRAME_SKIP = 4
 
 
 def get_key_from_env(key: str) -> Optional[str]:
@@ -43,33 +68,111 @@ def get_key_from_env(key: str) -> Optional[str]:
 
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.argument("video_loc")
-def main(video_loc: str) -> None:
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes to split scene detection across [default: all cores,"
+    " up to --max-threads]",
+)
+@click.option(
+    "--downscale",
+    type=int,
+    default=None,
+    help="Shrink frames by this factor for scene detection [default: auto]",
+)
+@click.option(
+    "--frame-skip",
+    default=FRAME_SKIP,
+    show_default=True,
+    help="Frames to skip between frames compared for scene detection",
+)
+@governor_options
+def main(
+    video_loc: str,
+    workers: Optional[int],
+    downscale: Optional[int],
+    frame_skip: int,
+    max_threads: int,
+    memory_budget: Optional[float],
+    while_recording: str,
+) -> None:
     """Read a video"""
-    read(video_loc)
+    governor = ResourceGovernor(
+        max_threads, memory_budget, while_recording=while_recording
+    ).apply()
+    read(
+        video_loc,
+        workers=workers,
+        downscale=downscale,
+        frame_skip=frame_skip,
+        governor=governor,
+    )
 
 
-def read(video_loc: str) -> None:
+def read(
+    video_loc: str,
+    workers: Optional[int] = None,
+    downscale: Optional[int] = None,
+    frame_skip: int = FRAME_SKIP,
+    governor: Optional[ResourceGovernor] = None,
+) -> None:
     """Read a video recording"""
-    scene_text = read_video_scenes(video_loc)
+    scene_text = read_video_scenes(
+        video_loc,
+        workers=workers,
+        downscale=downscale,
+        frame_skip=frame_skip,
+        governor=governor,
+    )
     logger.info("Writing result to text file")
     video_text = os.path.splitext(video_loc)[0] + ".txt"
     with open(video_text, "w") as file:
         file.write("Video Text:\n" + scene_text)
     logger.info(f"Text at: {video_text}")
+    indexer.index_output(video_text)
 
 
-def read_video_scenes(video_path, threshold=27.0):
-    """Split a video into scenes, save a single image from each, and read each one."""
+def read_video_scenes(
+    video_path,
+    threshold=27.0,
+    ocr_cache=OCR_CACHE,
+    workers=None,
+    downscale=None,
+    frame_skip=FRAME_SKIP,
+    governor=None,
+):
+    """
+    Split a video into scenes, save a single image from each, and read each
+    one. Scenes seen before (in any meeting) are looked up in the OCR cache
+    at `ocr_cache` and scenes that only partly changed are read only where
+    they changed. Pass `ocr_cache=None` to read every scene in full.
+    `workers`, `downscale` and `frame_skip` trade scene detection accuracy
+    for speed on long videos (see `meetaid.scenes.detect_scenes`); by
+    default every core is used. If a `governor` is given, it caps `workers`
+    and the OCR workers, and is consulted between scenes.
+    """
+    checkpoint = governor.checkpoint if governor else lambda: None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    ocr_workers = OCR_WORKERS
+    if governor is not None:
+        workers = governor.workers(workers)
+        # 0 reads in this process, which needs no cap
+        if ocr_workers:
+            ocr_workers = governor.workers(ocr_workers)
+    checkpoint()
     video = open_video(video_path)
     # video_20231202-092450
     # video_dt = datetime.strptime(video.name.split("_")[1], DT_FORMAT)
-    scene_manager = SceneManager()
-    scene_manager.add_detector(ContentDetector(threshold=threshold))
-    # Detect all scenes in video from current position to end.
-    scene_manager.detect_scenes(video)
-    # `get_scene_list` returns a list of start/end timecode pairs
-    # for each scene that was found.
-    scene_list = scene_manager.get_scene_list()
+    # A list of start/end timecode pairs for each scene that was found.
+    scene_list = detect_scenes(
+        video_path,
+        threshold=threshold,
+        downscale=downscale,
+        frame_skip=frame_skip,
+        workers=workers,
+    )
     logger.debug(scene_list)
     image_out_dir = os.path.dirname(video_path)
     img_ext = "jpg"
@@ -87,15 +190,35 @@ def read_video_scenes(video_path, threshold=27.0):
 
     # Read the text for each image in the list of scene images
     logger.info("Loading Reader")
-    reader = easyocr.Reader(["en"])
+    reader = easyocr.Reader(["en"], gpu=OCR_GPU)
+    cache = OCRCache(ocr_cache) if ocr_cache else None
+    previous = None
     read_text = ""
     logger.info("Reading scenes")
     for i, scene in enumerate(scene_list):
+        checkpoint()
         # video_20231202-092450-Scene-001.jpg
         scene_image = (
             f"{image_out_dir}/{video.name}-Scene-{(i+1):03}.{img_ext}"
         )
-        scene_text = reader.readtext(scene_image, detail=0)
+        if cache is None:
+            scene_text = reader.readtext(
+                scene_image,
+                detail=0,
+                workers=ocr_workers,
+                batch_size=OCR_BATCH_SIZE,
+            )
+        else:
+            frame = cv2.imread(scene_image)
+            if frame is None:
+                logger.warning(f"Could not read {scene_image}, skipping it")
+                scene_text = []
+            else:
+                results = read_scene(
+                    reader, frame, cache, previous, ocr_workers
+                )
+                previous = (frame, results)
+                scene_text = [text for _, text in results]
         read_text += f"[{scene[0].get_timecode()}-{scene[1].get_timecode()}]:  "
         read_text += f"{scene_text}\n\n"
         # Get datetime from video name
@@ -116,4 +239,74 @@ def read_video_scenes(video_path, threshold=27.0):
         #                    f"{img_time.strftime(DT_FORMAT)}.{img_ext}"
         # scene_images.append(new_file_name)
         # os.rename(scene_image, new_file_name)
+    if cache is not None:
+        logger.info(f"OCR cache hits: {cache.hits}, misses: {cache.misses}")
+        cache.close()
     return read_text
+
+
+def read_scene(
+    reader: easyocr.Reader,
+    frame: np.ndarray,
+    cache: OCRCache,
+    previous: Optional[Tuple[np.ndarray, List[OCRResult]]] = None,
+    workers: int = OCR_WORKERS,
+) -> List[OCRResult]:
+    """
+    Read the text in a scene frame, reusing earlier results where possible.
+
+    Args:
+        reader: The OCR reader.
+        frame: The scene image (BGR).
+        cache: Cache of results for frames already read.
+        previous: The previous scene's frame and results, if any.
+        workers: easyocr data loader workers, 0 to read in this process.
+
+    Returns:
+        A list of (box, text) results in reading order.
+    """
+    cached = cache.get(frame)
+    if cached is not None:
+        return cached
+    if previous is not None and previous[0].shape == frame.shape:
+        previous_frame, previous_results = previous
+        regions = changed_regions(
+            previous_frame,
+            frame,
+            text_boxes=[box for box, _ in previous_results],
+        )
+        if not regions:
+            return previous_results
+        if changed_fraction(regions, frame.shape) <= MAX_CHANGED_FRACTION:
+            regions = expand_regions(regions, previous_results)
+            region_results: List[OCRResult] = []
+            for left, top, right, bottom in regions:
+                region_results += _readtext(
+                    reader,
+                    frame[top:bottom, left:right],
+                    (left, top),
+                    workers,
+                )
+            results = merge_results(previous_results, regions, region_results)
+            cache.put(frame, results)
+            return results
+
+    results = _readtext(reader, frame, workers=workers)
+    cache.put(frame, results)
+    return results
+
+
+def _readtext(
+    reader: easyocr.Reader,
+    image: np.ndarray,
+    offset: Tuple[int, int] = (0, 0),
+    workers: int = OCR_WORKERS,
+) -> List[OCRResult]:
+    results: List[OCRResult] = []
+    for points, text, _ in reader.readtext(
+        image, workers=workers, batch_size=OCR_BATCH_SIZE
+    ):
+        xs = [int(x) + offset[0] for x, _ in points]
+        ys = [int(y) + offset[1] for _, y in points]
+        results.append(((min(xs), min(ys), max(xs), max(ys)), text))
+    return results
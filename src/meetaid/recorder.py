@@ -4,7 +4,12 @@ from datetime import datetime
 from tkinter import Button, Label, Tk
 
 from meetaid.audio_recorder import AudioRecorder
-from meetaid.video_recorder import VideoRecorder
+from meetaid.governor import set_recording
+from meetaid.video_recorder import (
+    BODY_TEXT_HEIGHT,
+    CaptureConfig,
+    VideoRecorder,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +20,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 DT_FORMAT = "%Y%m%d-%H%M%S"
+AUDIO_FORMAT = "flac"  # or "wav" for uncompressed PCM
 
 window = Tk()
 window.geometry("450x400")
@@ -28,10 +34,22 @@ class Recorder:
     def __init__(self, time=None):
         if not os.path.exists("output"):
             os.makedirs("output")
-        self.ar = AudioRecorder()
-        self.vr = VideoRecorder()
+        self.ar = AudioRecorder(audio_format=AUDIO_FORMAT)
+        self.active = set()
+        self.vr = VideoRecorder(
+            CaptureConfig(auto_detect=True, text_height=BODY_TEXT_HEIGHT)
+        )
+
+    def _set_active(self, recording, active):
+        """Let processing jobs know whether anything is being recorded"""
+        if active:
+            self.active.add(recording)
+        else:
+            self.active.discard(recording)
+        set_recording(bool(self.active))
 
     def start_audio_recording(self):
+        self._set_active("audio", True)
         dt = datetime.now().strftime(DT_FORMAT)
         self.ar.start_recording(dt)
         Label(window, text="Audio recording has started").pack()
@@ -39,20 +57,24 @@ class Recorder:
     def stop_audio_recording(self):
         Label(window, text="Stopping recording").pack()
         combined_filename = self.ar.stop_recording()
+        self._set_active("audio", False)
         Label(
             window, text=f"The audio is written to a [{combined_filename}]."
         ).pack()
 
     def start_video_recording(self):
+        self._set_active("video", True)
         dt = datetime.now().strftime(DT_FORMAT)
         self.vr.start_recording(dt)
         Label(window, text="Video recording has started").pack()
 
     def stop_video_recording(self):
         self.vr.stop_recording()
+        self._set_active("video", False)
         Label(window, text="Video recording has stopped").pack()
 
     def terminate(self):
+        set_recording(False)
         self.ar.close_stream()
         self.ar.terminate()
 
@@ -0,0 +1,149 @@
+"""Scene detection for long screen recordings.
+
+Detection can be sped up by downscaling frames, skipping frames and
+splitting the video into time ranges that are processed in parallel. Each
+range starts a little early so cuts right at a range edge are still seen,
+and cuts from all ranges are stitched into a single scene list.
+"""
+from typing import List, Optional, Tuple
+
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from scenedetect import (
+    ContentDetector,
+    FrameTimecode,
+    SceneManager,
+    open_video,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_SCENE_LEN = 15  # frames, ContentDetector's default
+SEGMENT_SECONDS = 300.0  # don't split the video into shorter ranges
+
+SceneList = List[Tuple[FrameTimecode, FrameTimecode]]
+
+
+def detect_scenes(
+    video_path: str,
+    threshold: float = 27.0,
+    downscale: Optional[int] = None,
+    frame_skip: int = 0,
+    workers: int = 1,
+    segment_seconds: float = SEGMENT_SECONDS,
+) -> SceneList:
+    """
+    Detect content changes (scenes) in a video.
+
+    Args:
+        video_path: Path to the video.
+        threshold: ContentDetector threshold.
+        downscale: Factor to shrink frames by before comparing them, or None
+            to pick one from the frame width.
+        frame_skip: Frames to skip after each processed frame.
+        workers: Processes to split the video across.
+        segment_seconds: Minimum length of the time range given to each
+            process.
+
+    Returns:
+        A list of (start, end) timecodes for each scene.
+    """
+    video = open_video(video_path)
+    fps = video.frame_rate
+    total_frames = video.duration.get_frames()
+    ranges = min(workers, int(total_frames // (segment_seconds * fps)))
+    if ranges <= 1:
+        cuts, end_frame = _detect_cuts(
+            video_path, 0, None, threshold, downscale, frame_skip
+        )
+        return _scene_list(cuts, end_frame, fps)
+
+    # Start each range early enough for the detector to have a previous
+    # frame and to be past its minimum scene length at the range edge
+    overlap = (MIN_SCENE_LEN + 2) * (frame_skip + 1)
+    starts = [math.floor(i * total_frames / ranges) for i in range(ranges)]
+    edges: List[Optional[int]] = [*starts, None]
+    logger.info(f"Detecting scenes in {ranges} ranges")
+    with ProcessPoolExecutor(max_workers=ranges) as pool:
+        futures = [
+            pool.submit(
+                _detect_cuts,
+                video_path,
+                max(0, start - overlap),
+                end,
+                threshold,
+                downscale,
+                frame_skip,
+            )
+            for start, end in zip(starts, edges[1:])
+        ]
+        results = [future.result() for future in futures]
+
+    kept_cuts: List[int] = []
+    for start, end, (range_cuts, _) in zip(starts, edges[1:], results):
+        kept_cuts += [
+            cut
+            for cut in range_cuts
+            if cut >= start and (end is None or cut < end)
+        ]
+    return _scene_list(stitch_cuts(kept_cuts), results[-1][1], fps)
+
+
+def stitch_cuts(
+    cuts: List[int], min_scene_len: int = MIN_SCENE_LEN
+) -> List[int]:
+    """
+    Merge cuts found in separate ranges, dropping any that would make a
+    scene shorter than `min_scene_len` frames.
+    """
+    stitched: List[int] = []
+    last_cut = 0
+    for cut in sorted(set(cuts)):
+        if cut - last_cut >= min_scene_len:
+            stitched.append(cut)
+            last_cut = cut
+    return stitched
+
+
+def _detect_cuts(
+    video_path: str,
+    start_frame: int,
+    end_frame: Optional[int],
+    threshold: float,
+    downscale: Optional[int],
+    frame_skip: int,
+) -> Tuple[List[int], int]:
+    """Cut frame numbers in the range and the frame after the last one read"""
+    video = open_video(video_path)
+    if start_frame:
+        video.seek(start_frame)
+    scene_manager = SceneManager()
+    if downscale:
+        scene_manager.auto_downscale = False
+        scene_manager.downscale = downscale
+    scene_manager.add_detector(
+        ContentDetector(threshold=threshold, min_scene_len=MIN_SCENE_LEN)
+    )
+    scene_manager.detect_scenes(
+        video,
+        end_time=None
+        if end_frame is None
+        else FrameTimecode(end_frame, video.frame_rate),
+        frame_skip=frame_skip,
+    )
+    scene_list = scene_manager.get_scene_list()
+    cuts = [start.get_frames() for start, _ in scene_list[1:]]
+    return cuts, video.position.get_frames() + 1
+
+
+def _scene_list(cuts: List[int], end_frame: int, fps: float) -> SceneList:
+    if not cuts:
+        return []
+    starts = [0] + cuts
+    ends = cuts + [end_frame]
+    return [
+        (FrameTimecode(start, fps), FrameTimecode(end, fps))
+        for start, end in zip(starts, ends)
+    ]
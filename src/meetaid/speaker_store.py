@@ -0,0 +1,189 @@
+"""Persistent store of speaker embeddings.
+
+Holds embeddings of enrolled (named) speakers, kept in memory as a
+normalized matrix so matching a diarized speaker is a single
+matrix-vector product, and a cache of the per-speaker embeddings already
+computed for each processed recording.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import logging
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPEAKER_DB = "output/speakers.db"
+MATCH_THRESHOLD = 0.5  # minimum cosine similarity to name a speaker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speakers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    embedding BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_embeddings (
+    path TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    label TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    PRIMARY KEY (path, signature, label)
+);
+"""
+
+
+def _to_blob(embedding: np.ndarray) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def _from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    normalized: np.ndarray = embeddings / np.maximum(norms, 1e-12)
+    return normalized
+
+
+class SpeakerStore:
+    """Enrolled speakers and cached recording embeddings"""
+
+    def __init__(self, db_loc: str = SPEAKER_DB):
+        if db_loc != ":memory:":
+            Path(db_loc).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_loc)
+        self.conn.executescript(SCHEMA)
+        self._load()
+
+    def _load(self) -> None:
+        rows = self.conn.execute(
+            "SELECT name, embedding FROM speakers ORDER BY id"
+        ).fetchall()
+        self.names: List[str] = [name for name, _ in rows]
+        if rows:
+            self.matrix = _normalize(
+                np.stack([_from_blob(blob) for _, blob in rows])
+            )
+        else:
+            self.matrix = np.empty((0, 0), dtype=np.float32)
+
+    def enroll(self, name: str, embedding: np.ndarray) -> None:
+        """Add an embedding of a named speaker"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO speakers (name, embedding) VALUES (?, ?)",
+                (name, _to_blob(embedding)),
+            )
+        self._load()
+
+    def remove(self, name: str) -> int:
+        """Remove a speaker, returning the number of embeddings removed"""
+        with self.conn:
+            removed = self.conn.execute(
+                "DELETE FROM speakers WHERE name = ?", (name,)
+            ).rowcount
+        self._load()
+        return removed
+
+    def speakers(self) -> Dict[str, int]:
+        """Enrolled speaker names and their number of embeddings"""
+        counts: Dict[str, int] = {}
+        for name in self.names:
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def match(
+        self, embedding: np.ndarray, threshold: float = MATCH_THRESHOLD
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Find the enrolled speaker nearest to an embedding.
+
+        Args:
+            embedding: Embedding of an unknown speaker.
+            threshold: Minimum cosine similarity for a match.
+
+        Returns:
+            The (name, similarity) of the best match, or None.
+        """
+        if not self.names:
+            return None
+        similarities = self.matrix @ _normalize(
+            np.asarray(embedding, dtype=np.float32)
+        )
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        return self.names[best], float(similarities[best])
+
+    def identify(
+        self,
+        embeddings: Dict[str, np.ndarray],
+        threshold: float = MATCH_THRESHOLD,
+    ) -> Dict[str, str]:
+        """
+        Name the diarized speakers of a recording. Each enrolled speaker is
+        given to at most one label, the most similar one.
+
+        Args:
+            embeddings: Embedding of each diarization label.
+            threshold: Minimum cosine similarity for a match.
+
+        Returns:
+            Map of diarization label (e.g. SPEAKER_00) to speaker name for
+            the labels that matched.
+        """
+        matches = []
+        for label, embedding in embeddings.items():
+            match = self.match(embedding, threshold)
+            if match is not None:
+                matches.append((match[1], label, match[0]))
+        names: Dict[str, str] = {}
+        for _, label, name in sorted(matches, reverse=True):
+            if name not in names.values():
+                names[label] = name
+        return names
+
+    def get_file_embeddings(
+        self, path: str, signature: Optional[str] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Cached per-label embeddings of a recording, if any.
+
+        Args:
+            path: Absolute path of the recording.
+            signature: Identifies the recording contents and diarization
+                the embeddings were computed from. If None, whatever was
+                cached last for the path is returned.
+        """
+        query = "SELECT label, embedding FROM file_embeddings WHERE path = ?"
+        params: Tuple[str, ...] = (path,)
+        if signature is not None:
+            query += " AND signature = ?"
+            params += (signature,)
+        rows = self.conn.execute(query, params).fetchall()
+        if not rows:
+            return None
+        return {label: _from_blob(blob) for label, blob in rows}
+
+    def put_file_embeddings(
+        self, path: str, signature: str, embeddings: Dict[str, np.ndarray]
+    ) -> None:
+        """Cache the per-label embeddings of a recording"""
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM file_embeddings WHERE path = ?", (path,)
+            )
+            self.conn.executemany(
+                "INSERT INTO file_embeddings"
+                " (path, signature, label, embedding) VALUES (?, ?, ?, ?)",
+                [
+                    (path, signature, label, _to_blob(embedding))
+                    for label, embedding in embeddings.items()
+                ],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
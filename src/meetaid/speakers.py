@@ -0,0 +1,301 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import hashlib
+import logging
+import os
+
+import click
+import numpy as np
+import torch
+from pyannote.audio import Audio, Inference, Model
+from pyannote.core import Segment
+
+from meetaid.indexer import SOURCE_TRANSCRIPT, parse_output
+from meetaid.speaker_store import MATCH_THRESHOLD, SPEAKER_DB, SpeakerStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+# Loads with the locked pyannote.audio 3.0.1 (the WeSpeaker models need 3.1)
+EMBEDDING_MODEL = "pyannote/embedding"
+EMBEDDING_DEVICE = "cpu"
+HF_TOKEN = "HF_TOKEN"
+MIN_TURN_SECONDS = 1.0  # shorter turns give unreliable embeddings
+MAX_SECONDS_PER_SPEAKER = 60.0  # embed at most this much of each speaker
+
+
+def get_key_from_env(key: str) -> Optional[str]:
+    """
+    Get a key from the environment variables.
+
+    Args:
+        key: HF_TOKEN (HuggingFace Token)
+
+    Returns:
+        The value of the key if it exists, else None.
+    """
+    if key not in os.environ:
+        logger.critical(
+            f"{key} does not exist as environment variable.",
+        )
+        logger.debug(os.environ)
+    return os.getenv(key)
+
+
+@click.group(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--db", "db_loc", default=SPEAKER_DB, show_default=True, help="Store"
+)
+@click.pass_context
+def main(ctx: click.Context, db_loc: str) -> None:
+    """Manage known speakers"""
+    ctx.obj = db_loc
+
+
+@main.command("enroll")
+@click.argument("name")
+@click.argument("audio_loc")
+@click.option(
+    "--label",
+    default=None,
+    help="Diarization label (e.g. SPEAKER_01) of a transcribed recording",
+)
+@click.option("--start", type=float, default=None, help="Clip start (s)")
+@click.option("--end", type=float, default=None, help="Clip end (s)")
+@click.pass_obj
+def enroll_command(
+    db_loc: str,
+    name: str,
+    audio_loc: str,
+    label: Optional[str],
+    start: Optional[float],
+    end: Optional[float],
+) -> None:
+    """Enroll a speaker from a recording of them, or from a label"""
+    store = SpeakerStore(db_loc)
+    try:
+        if label is not None:
+            embeddings = store.get_file_embeddings(os.path.abspath(audio_loc))
+            if embeddings and label in embeddings:
+                embedding = embeddings[label]
+            else:
+                turns = transcript_turns(audio_loc).get(label)
+                if not turns:
+                    raise click.ClickException(
+                        f"No turns of {label} in the transcript of"
+                        f" {audio_loc}, transcribe it first"
+                    )
+                turns_embedding = embed_turns(
+                    load_inference(), audio_loc, turns
+                )
+                if turns_embedding is None:
+                    raise click.ClickException(
+                        f"{label} has no turns long enough to enroll"
+                    )
+                embedding = turns_embedding
+        else:
+            inference = load_inference()
+            if start is not None or end is not None:
+                if end is None:
+                    end = Audio().get_duration(audio_loc)
+                segment = Segment(start or 0.0, end)
+                embedding = np.ravel(inference.crop(audio_loc, segment))
+            else:
+                embedding = np.ravel(inference(audio_loc))
+        store.enroll(name, embedding)
+    finally:
+        store.close()
+    logger.info(f"Enrolled {name}")
+
+
+@main.command("list")
+@click.pass_obj
+def list_command(db_loc: str) -> None:
+    """List enrolled speakers"""
+    store = SpeakerStore(db_loc)
+    for name, count in store.speakers().items():
+        click.echo(f"{name} ({count} sample{'s' if count > 1 else ''})")
+    store.close()
+
+
+@main.command("remove")
+@click.argument("name")
+@click.pass_obj
+def remove_command(db_loc: str, name: str) -> None:
+    """Remove an enrolled speaker"""
+    store = SpeakerStore(db_loc)
+    removed = store.remove(name)
+    store.close()
+    logger.info(f"Removed {removed} sample(s) of {name}")
+
+
+def load_inference(device: str = EMBEDDING_DEVICE) -> Inference:
+    """Load the speaker embedding model"""
+    logger.info("Loading embedding model: " + EMBEDDING_MODEL)
+    model = Model.from_pretrained(
+        EMBEDDING_MODEL, use_auth_token=get_key_from_env(HF_TOKEN)
+    )
+    inference = Inference(model, window="whole")
+    inference.to(torch.device(device))
+    return inference
+
+
+def speaker_turns(
+    diarization_result: Any,
+) -> Dict[str, List[Tuple[float, float]]]:
+    """Start and end of each turn of each diarized speaker"""
+    turns: Dict[str, List[Tuple[float, float]]] = {}
+    for row in diarization_result.itertuples():
+        turns.setdefault(row.speaker, []).append(
+            (float(row.start), float(row.end))
+        )
+    return turns
+
+
+def transcript_turns(audio_file: str) -> Dict[str, List[Tuple[float, float]]]:
+    """Turns of each speaker in the transcript written for a recording"""
+    transcript_loc = os.path.splitext(audio_file)[0] + ".txt"
+    if not os.path.exists(transcript_loc):
+        return {}
+    with open(transcript_loc) as file:
+        parsed = parse_output(file.read())
+    if parsed is None or parsed[0] != SOURCE_TRANSCRIPT:
+        return {}
+    turns: Dict[str, List[Tuple[float, float]]] = {}
+    for seg in parsed[1]:
+        turns.setdefault(seg["speaker"], []).append((seg["start"], seg["end"]))
+    return turns
+
+
+def embedding_signature(
+    audio_file: str, turns: Dict[str, List[Tuple[float, float]]]
+) -> str:
+    """Identifies a recording's contents, diarization and embedding model"""
+    stat = os.stat(audio_file)
+    signature = hashlib.sha1(
+        f"{EMBEDDING_MODEL}:{stat.st_mtime}:{stat.st_size}".encode()
+    )
+    for label in sorted(turns):
+        for start, end in turns[label]:
+            signature.update(f"{label}:{start:.2f}-{end:.2f};".encode())
+    return signature.hexdigest()
+
+
+def embed_speakers(
+    audio_file: str,
+    diarization_result: Any,
+    store: SpeakerStore,
+    device: str = EMBEDDING_DEVICE,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute an embedding for each diarized speaker of a recording, from
+    their longest turns. Embeddings are cached in the store so a recording
+    is only embedded once.
+
+    Args:
+        audio_file: Path to the audio file.
+        diarization_result: Diarization of the audio file.
+        store: Speaker store holding the cache.
+        device: Device to run the embedding model on.
+
+    Returns:
+        Map of diarization label to embedding.
+    """
+    file_loc = os.path.abspath(audio_file)
+    turns = speaker_turns(diarization_result)
+    signature = embedding_signature(file_loc, turns)
+    embeddings = store.get_file_embeddings(file_loc, signature)
+    if embeddings is not None:
+        logger.info("Using cached speaker embeddings")
+        return embeddings
+
+    inference = load_inference(device)
+    logger.info("Computing speaker embeddings")
+    embeddings = {}
+    for label, label_turns in turns.items():
+        embedding = embed_turns(inference, file_loc, label_turns)
+        if embedding is not None:
+            embeddings[label] = embedding
+    store.put_file_embeddings(file_loc, signature, embeddings)
+    return embeddings
+
+
+def embed_turns(
+    inference: Inference, audio_file: str, turns: List[Tuple[float, float]]
+) -> Optional[np.ndarray]:
+    """
+    Embedding of a speaker from their longest turns, weighted by length.
+
+    Args:
+        inference: Embedding model returned by `load_inference`.
+        audio_file: Path to the audio file.
+        turns: (start, end) of each of the speaker's turns in seconds.
+
+    Returns:
+        The embedding, or None if no turn is long enough.
+    """
+    vectors: List[np.ndarray] = []
+    weights: List[float] = []
+    for start, end in sorted(turns, key=lambda turn: turn[0] - turn[1]):
+        if end - start < MIN_TURN_SECONDS:
+            break
+        if sum(weights) >= MAX_SECONDS_PER_SPEAKER:
+            break
+        segment = Segment(start, end)
+        vectors.append(np.ravel(inference.crop(audio_file, segment)))
+        weights.append(end - start)
+    if not vectors:
+        return None
+    return np.average(vectors, axis=0, weights=weights)
+
+
+def identify_speakers(
+    audio_file: str,
+    diarization_result: Any,
+    device: str = EMBEDDING_DEVICE,
+    db_loc: str = SPEAKER_DB,
+    threshold: float = MATCH_THRESHOLD,
+) -> Dict[str, str]:
+    """
+    Match the diarized speakers of a recording to enrolled speakers.
+
+    Args:
+        audio_file: Path to the audio file.
+        diarization_result: Diarization of the audio file.
+        device: Device to run the embedding model on.
+        db_loc: Path to the speaker store.
+        threshold: Minimum cosine similarity for a match.
+
+    Returns:
+        Map of diarization label to speaker name for matched labels.
+    """
+    store = SpeakerStore(db_loc)
+    try:
+        if not store.names:
+            logger.info("No enrolled speakers to identify")
+            return {}
+        embeddings = embed_speakers(
+            audio_file, diarization_result, store, device
+        )
+        names = store.identify(embeddings, threshold)
+    finally:
+        store.close()
+    for label, name in sorted(names.items()):
+        logger.info(f"{label} is {name}")
+    return names
+
+
+def rename_speakers(diarization_result: Any, names: Dict[str, str]) -> None:
+    """Replace diarization labels with speaker names, in place"""
+    diarization_result["speaker"] = diarization_result["speaker"].replace(
+        names
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,11 @@ import whisper
 from whisperx import align, load_align_model
 from whisperx.diarize import DiarizationPipeline, assign_word_speakers
 
+from meetaid import indexer
+from meetaid.governor import ResourceGovernor, governor_options
+from meetaid.profile import load_profile
+from meetaid.speakers import identify_speakers, rename_speakers
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -19,8 +24,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
-WHISPER_MODEL = "medium.en"
-WHISPER_DEVICE = "cuda"  # "cpu" or "cuda" if available
+# Settings measured for this host by `python -m meetaid.autotune`, if run
+PROFILE = load_profile("transcriber")
+WHISPER_MODEL = PROFILE.get("whisper_model", "medium.en")
+WHISPER_DEVICE = PROFILE.get("device", "cuda")  # "cpu" or "cuda"
+WHISPER_FP16 = PROFILE.get("fp16", True)  # half precision, cuda only
 LANGUAGE = "en"
 HF_TOKEN = "HF_TOKEN"
 
@@ -45,13 +53,36 @@ def get_key_from_env(key: str) -> Optional[str]:
 
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.argument("audio_loc")
-def main(audio_loc: str) -> None:
+@click.option(
+    "--num-speakers",
+    type=int,
+    default=None,
+    help="Number of speakers, if known, to skip estimating it",
+)
+@governor_options
+def main(
+    audio_loc: str,
+    num_speakers: Optional[int],
+    max_threads: int,
+    memory_budget: Optional[float],
+    while_recording: str,
+) -> None:
     """Transcribe an audio recording"""
-    transcribe(audio_loc)
+    governor = ResourceGovernor(
+        max_threads, memory_budget, while_recording=while_recording
+    ).apply()
+    transcribe(audio_loc, num_speakers=num_speakers, governor=governor)
 
 
-def transcribe(audio_loc: str) -> None:
-    """Transcribe an audio recording"""
+def transcribe(
+    audio_loc: str,
+    num_speakers: Optional[int] = None,
+    governor: Optional[ResourceGovernor] = None,
+) -> None:
+    """
+    Transcribe an audio recording. If a governor is given, it is
+    consulted between steps so a live recording keeps priority.
+    """
 
     file_loc = audio_loc
     file_path = Path(audio_loc)
@@ -61,15 +92,26 @@ def transcribe(audio_loc: str) -> None:
         logger.error(f"CWD: {os.getcwd()}")
         return None
 
-    # Convert to WAV
-    if file_path.suffix != ".wav":
+    # Convert to WAV; FLAC recordings are read directly
+    if file_path.suffix not in (".wav", ".flac"):
         convert_to_wav(file_loc)
         file_loc = os.path.splitext(file_loc)[0] + ".wav"
 
     # Transcribe and Diarize
+    checkpoint = governor.checkpoint if governor else lambda: None
+    checkpoint()
     transcript = transcribe_file(file_loc)
+    checkpoint()
     aligned_segments = align_segments(transcript, file_loc)
-    diarization_result = diarize(file_loc)
+    checkpoint()
+    diarization_result = diarize(file_loc, num_speakers=num_speakers)
+    checkpoint()
+    try:
+        names = identify_speakers(file_loc, diarization_result, WHISPER_DEVICE)
+    except Exception as e:
+        logger.warning(f"Could not identify speakers, keeping labels: {e}")
+        names = {}
+    rename_speakers(diarization_result, names)
     results_segments_w_speakers = assign_speakers(
         diarization_result, aligned_segments
     )
@@ -87,6 +129,7 @@ def transcribe(audio_loc: str) -> None:
     with open(transcribed, "w") as file:
         file.write("Transcript:\n" + transcript_text)
     logger.info(f"Transcription at: {transcribed}")
+    indexer.index_output(transcribed)
 
 
 def convert_to_wav(input_file: str) -> None:
@@ -133,10 +176,9 @@ def transcribe_file(audio_file: str) -> Dict[str, Any]:
     # transcribe with original whisper
     logger.info("Loading model: " + WHISPER_MODEL)
     model = whisper.load_model(WHISPER_MODEL, WHISPER_DEVICE)
-    whisper.DecodingOptions(language=LANGUAGE)
-    # Transcribe
+    # Transcribe, skipping language detection
     logger.info("Transcribing")
-    return model.transcribe(audio_file)
+    return model.transcribe(audio_file, fp16=WHISPER_FP16, language=LANGUAGE)
 
 
 def align_segments(
@@ -162,11 +204,15 @@ def align_segments(
     return result_aligned
 
 
-def diarize(audio_file: str) -> Dict[str, Any]:
+def diarize(
+    audio_file: str, num_speakers: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Perform speaker diarization on an audio file.
     Args:
         audio_file: Path to the audio file to diarize.
+        num_speakers: Number of speakers, if known. Saves the clustering
+            step from estimating it.
     Returns:
         A dictionary representing the diarized audio file,
         including the speaker embeddings and the number of speakers.
@@ -175,7 +221,9 @@ def diarize(audio_file: str) -> Dict[str, Any]:
     diarization_pipeline = DiarizationPipeline(
         use_auth_token=get_key_from_env(HF_TOKEN)
     )
-    diarization_result = diarization_pipeline(audio_file)
+    diarization_result = diarization_pipeline(
+        audio_file, num_speakers=num_speakers
+    )
     return diarization_result
 
 
@@ -1,5 +1,9 @@
+from typing import Optional, Tuple
+
 import logging
 import threading
+import time
+from dataclasses import dataclass
 
 import cv2
 import numpy as np
@@ -25,19 +29,181 @@ CODEC = cv2.VideoWriter_fourcc(*"XVID")
 # frames per second
 FPS = 60.0
 video_filename = "output/video_{}.avi"
+# Titles of the windows meetings and shared content are shown in
+MEETING_WINDOW_TITLES = ("Zoom Meeting", "Microsoft Teams", "Meet - ", "Webex")
+# Pixel size of body text (chat, slide bullets, shared documents) in
+# meeting windows at 100% display scaling
+BODY_TEXT_HEIGHT = 14
+# Frames are only downscaled as far as text keeps this pixel size, since
+# easyocr stops reading smaller text reliably
+MIN_TEXT_HEIGHT = 12
+REDETECT_SECONDS = 5.0
+# A meeting window is only recorded if this much of it is on the screen
+MIN_VISIBLE_FRACTION = 0.5
+MIN_REGION_SIZE = (320, 180)
+
+Region = Tuple[int, int, int, int]  # left, top, width, height
+
+
+@dataclass
+class CaptureConfig:
+    """
+    What part of the screen is recorded and at what resolution.
+
+    Attributes:
+        region: Screen region to record, and the fallback when no meeting
+            window is found.
+        auto_detect: Record the meeting window instead of `region`,
+            following it if it moves.
+        window_titles: Title substrings that identify a meeting window.
+        text_height: Pixel size of the smallest text to keep legible in
+            the recorded window; frames are downscaled until it is
+            `MIN_TEXT_HEIGHT`. None keeps the captured resolution.
+        redetect_seconds: How often to look for the meeting window again.
+    """
+
+    region: Region = VIDEO_REGION
+    auto_detect: bool = False
+    window_titles: Tuple[str, ...] = MEETING_WINDOW_TITLES
+    text_height: Optional[int] = None
+    redetect_seconds: float = REDETECT_SECONDS
+
+
+def find_meeting_window(titles: Tuple[str, ...]) -> Optional[Region]:
+    """
+    Find the on-screen region of the meeting window: the active one if a
+    meeting window has focus, else the largest.
+
+    Args:
+        titles: Title substrings that identify a meeting window.
+
+    Returns:
+        The window's region clipped to the screen, or None if there is no
+        meeting window mostly on this screen (or windows can't be listed
+        on this OS).
+    """
+    get_windows = getattr(pyautogui, "getWindowsWithTitle", None)
+    if get_windows is None:
+        return None
+    # Windows on another monitor can't be recorded from this screen
+    visible = []
+    for title in titles:
+        for window in get_windows(title):
+            if window.isMinimized:
+                continue
+            region = clip_region(
+                (window.left, window.top, window.width, window.height),
+                SCREEN_SIZE,
+            )
+            if region is not None:
+                visible.append((window.isActive, region))
+    if not visible:
+        return None
+    active = [region for is_active, region in visible if is_active]
+    regions = active or [region for _, region in visible]
+    return max(regions, key=lambda region: region[2] * region[3])
+
+
+def clip_region(
+    region: Region,
+    screen_size: Tuple[int, int],
+    min_fraction: float = MIN_VISIBLE_FRACTION,
+    min_size: Tuple[int, int] = MIN_REGION_SIZE,
+) -> Optional[Region]:
+    """
+    Clip a region to the screen.
+
+    Args:
+        region: Region to clip.
+        screen_size: Width and height of the screen.
+        min_fraction: Part of the region's area that must be on screen.
+        min_size: Smallest width and height of the clipped region.
+
+    Returns:
+        The clipped region, or None if too little of it is on screen.
+    """
+    left, top, width, height = region
+    right = min(left + width, screen_size[0])
+    bottom = min(top + height, screen_size[1])
+    left, top = max(left, 0), max(top, 0)
+    clipped_width, clipped_height = right - left, bottom - top
+    if (
+        clipped_width < min_size[0]
+        or clipped_height < min_size[1]
+        or clipped_width * clipped_height < min_fraction * width * height
+    ):
+        return None
+    return (left, top, clipped_width, clipped_height)
+
+
+def frame_size(
+    region: Region,
+    text_height: Optional[int],
+    min_text_height: int = MIN_TEXT_HEIGHT,
+) -> Tuple[int, int]:
+    """
+    Output frame size for a region, downscaled as far as text
+    `text_height` pixels tall stays `min_text_height` pixels tall.
+    """
+    width, height = region[2], region[3]
+    if text_height is not None and text_height > min_text_height:
+        scale = min_text_height / text_height
+        width, height = round(width * scale), round(height * scale)
+    # Most codecs need even (and non-zero) dimensions
+    return (max(2, width - width % 2), max(2, height - height % 2))
+
+
+def fit_frame(frame: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """
+    Scale a frame to fit `size`, keeping its aspect ratio and padding the
+    rest with black.
+    """
+    height, width = frame.shape[:2]
+    if (width, height) == size:
+        return frame
+    scale = min(size[0] / width, size[1] / height)
+    scaled_size = (
+        max(1, min(size[0], round(width * scale))),
+        max(1, min(size[1], round(height * scale))),
+    )
+    scaled = cv2.resize(frame, scaled_size, interpolation=cv2.INTER_AREA)
+    if scaled_size == size:
+        return scaled
+    fitted = np.zeros((size[1], size[0], 3), dtype=frame.dtype)
+    left = (size[0] - scaled_size[0]) // 2
+    top = (size[1] - scaled_size[1]) // 2
+    fitted[top : top + scaled_size[1], left : left + scaled_size[0]] = scaled
+    return fitted
 
 
 class VideoRecorder:
-    def __init__(self):
+    def __init__(self, config: Optional[CaptureConfig] = None):
         # Get the webcam if recording separate from screen
         self.started = False
+        self.config = config if config is not None else CaptureConfig()
+
+    def _capture_region(self) -> Region:
+        if self.config.auto_detect:
+            region = find_meeting_window(self.config.window_titles)
+            if region is not None:
+                return region
+        return self.config.region
 
     def start_recording(self, unique_id):
         self.unique_id = unique_id
         logger.debug(video_filename.format(self.unique_id))
+        self.region = self._capture_region()
+        self.frame_size = frame_size(self.region, self.config.text_height)
+        logger.info(
+            f"Recording region {self.region} at {self.frame_size[0]}x"
+            f"{self.frame_size[1]}"
+        )
         # create the video write object
         self.vw = cv2.VideoWriter(
-            video_filename.format(self.unique_id), CODEC, FPS, (VIDEO_SIZE)
+            video_filename.format(self.unique_id),
+            CODEC,
+            FPS,
+            self.frame_size,
         )
         if self.started:
             logger.warn("Threaded video capturing has already been started.")
@@ -48,10 +214,19 @@ class VideoRecorder:
         return self
 
     def _update_video(self):
+        detected = time.monotonic()
         while self.started:
-            img = pyautogui.screenshot(region=VIDEO_REGION)
+            if (
+                self.config.auto_detect
+                and time.monotonic() - detected >= self.config.redetect_seconds
+            ):
+                self.region = self._capture_region()
+                detected = time.monotonic()
+            img = pyautogui.screenshot(region=self.region)
             frame = np.array(img)
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # The window may have moved or resized since the writer opened
+            frame = fit_frame(frame, self.frame_size)
             for i in range(0, 5):
                 self.vw.write(frame)
 
@@ -0,0 +1,106 @@
+import threading
+import time
+from queue import Queue
+
+import numpy as np
+import soundfile as sf
+
+from meetaid.audio_recorder import AudioRecorder
+from meetaid.capture import ToneBackend
+from meetaid.flac_encoder import FlacEncoder, mix_files
+
+
+def test_encoder_is_lossless(tmp_path):
+    """Verify 24-bit PCM survives FLAC encoding bit for bit"""
+    samples = np.array([[0, -1], [8388607, -8388608], [12345, -54321]])
+    pcm = b"".join(
+        int(s).to_bytes(3, "little", signed=True) for s in samples.ravel()
+    )
+    queue: Queue = Queue()
+    filename = str(tmp_path / "test.flac")
+    encoder = FlacEncoder(queue, filename, 2, 16000, 3)
+    encoder.start()
+    queue.put(pcm)
+    queue.put(pcm)
+    assert encoder.finish() == 6
+    decoded, rate = sf.read(filename, dtype="int32")
+    assert rate == 16000
+    assert np.array_equal(decoded >> 8, np.vstack([samples, samples]))
+
+
+def test_encoder_keeps_recording_after_write_error(tmp_path):
+    """Verify a failed write keeps the FLAC so far and loses no frames"""
+    samples = np.arange(-3000, 3000, dtype=np.int16).reshape(-1, 2)
+    queue: Queue = Queue()
+    filename = str(tmp_path / "test.flac")
+    encoder = FlacEncoder(queue, filename, 2, 16000, 2)
+    queue.put(samples[:1000].tobytes())
+    encoder.start()
+    while encoder.frames < 1000:
+        time.sleep(0.01)
+
+    def disk_full(data):
+        raise OSError("No space left on device")
+
+    encoder.file.write = disk_full
+    queue.put(samples[1000:2000].tobytes())
+    queue.put(samples[2000:].tobytes())
+    assert encoder.finish() == 3000
+    assert isinstance(encoder.error, OSError)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["test.flac"]
+    decoded, _ = sf.read(filename, dtype="int16")
+    assert np.array_equal(decoded, samples)
+
+
+def test_mix_files(tmp_path):
+    """Verify files are summed, clipped and padded to the longest"""
+    a, b = str(tmp_path / "a.flac"), str(tmp_path / "b.flac")
+    sf.write(a, np.array([100, 32767, 5], dtype=np.int16), 8000)
+    sf.write(b, np.array([-50, 10], dtype=np.int16), 8000)
+    mixed = str(tmp_path / "mixed.flac")
+    mix_files([a, b], mixed)
+    decoded, _ = sf.read(mixed, dtype="int16")
+    assert decoded.tolist() == [50, 32767, 5]
+
+
+def test_flac_recording(tmp_path):
+    """Verify a FLAC recording holds every captured frame"""
+    backend = ToneBackend(rate=16000, speed=0, duration=2.0)
+    recorder = AudioRecorder(
+        backend=backend, output_dir=str(tmp_path), audio_format="flac"
+    )
+    recorder.start_recording("test")
+    for stream in backend.streams:
+        stream.finished.wait(10)
+    combined_filename = recorder.stop_recording()
+    recorder.terminate()
+    assert combined_filename.endswith("audio_test.flac")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["audio_test.flac"]
+    info = sf.info(combined_filename)
+    chunks = int(2.0 * 16000 / AudioRecorder.CHUNK_SIZE)
+    assert info.frames == chunks * AudioRecorder.CHUNK_SIZE
+    assert (info.channels, info.subtype) == (2, "PCM_24")
+
+
+def test_flac_recording_restart(tmp_path):
+    """Verify starting again without stopping finishes the first recording"""
+    backend = ToneBackend(rate=16000, speed=0, duration=1.0)
+    recorder = AudioRecorder(
+        backend=backend, output_dir=str(tmp_path), audio_format="flac"
+    )
+    recorder.start_recording("first")
+    recorder.start_recording("second")
+    for stream in backend.streams:
+        stream.finished.wait(10)
+    stopper = threading.Thread(target=recorder.stop_recording, daemon=True)
+    stopper.start()
+    stopper.join(10)
+    recorder.terminate()
+    assert not stopper.is_alive()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "audio_first.flac",
+        "audio_second.flac",
+    ]
+    chunks = int(1.0 * 16000 / AudioRecorder.CHUNK_SIZE)
+    info = sf.info(str(tmp_path / "audio_second.flac"))
+    assert info.frames == chunks * AudioRecorder.CHUNK_SIZE
@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import psutil
+import pytest
+
+from meetaid import governor
+from meetaid.governor import ResourceBudgetExceeded, ResourceGovernor
+
+# Applies a governor, then idles in a thread started before any recording
+CHILD_JOB = """
+import sys, threading, time
+from meetaid import governor
+governor.POLL_SECONDS = 0.01
+gov = governor.ResourceGovernor(
+    lower_priority=False, recording_flag=sys.argv[1]
+)
+gov.apply()
+worker = threading.Thread(target=time.sleep, args=(60,))
+worker.start()
+print("ready", flush=True)
+worker.join()
+"""
+
+
+@pytest.fixture(autouse=True)
+def cv2_threads():
+    """Keep governors from changing OpenCV threads for later tests"""
+    threads = cv2.getNumThreads()
+    yield
+    cv2.setNumThreads(threads)
+
+
+def test_recording_flag(tmp_path):
+    """Verify the flag marks a recording active until cleared"""
+    flag_loc = str(tmp_path / ".recording")
+    assert not governor.recording_active(flag_loc)
+    governor.set_recording(True, flag_loc)
+    assert governor.recording_active(flag_loc)
+    governor.set_recording(False, flag_loc)
+    assert not governor.recording_active(flag_loc)
+
+
+def test_stale_recording_flag(tmp_path):
+    """Verify a flag left by a recorder that is gone is ignored"""
+    flag = tmp_path / ".recording"
+    flag.write_text("999999999")
+    assert not governor.recording_active(str(flag))
+
+
+def test_pause_while_recording(tmp_path, monkeypatch):
+    """Verify a checkpoint waits for the recording to finish"""
+    monkeypatch.setattr(governor, "POLL_SECONDS", 0.01)
+    flag_loc = str(tmp_path / ".recording")
+    governor.set_recording(True, flag_loc)
+    timer = threading.Timer(0.1, governor.set_recording, (False, flag_loc))
+    timer.start()
+    ResourceGovernor(recording_flag=flag_loc).checkpoint()
+    assert not governor.recording_active(flag_loc)
+
+
+def test_throttle_while_recording(tmp_path):
+    """Verify throttling starts and stops with the recording"""
+    flag_loc = str(tmp_path / ".recording")
+    gov = ResourceGovernor(
+        max_threads=4, while_recording="throttle", recording_flag=flag_loc
+    )
+    assert gov.workers(8) == 4
+    governor.set_recording(True, flag_loc)
+    gov.checkpoint()
+    assert cv2.getNumThreads() == 1
+    governor.set_recording(False, flag_loc)
+    gov.checkpoint()
+    assert cv2.getNumThreads() == 4
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="per-thread nice values"
+)
+def test_deprioritize_during_step(tmp_path):
+    """Verify every thread of a job drops priority without a checkpoint"""
+    flag_loc = str(tmp_path / ".recording")
+    # In a child process, as the priority may not be raised again
+    job = subprocess.Popen(
+        [sys.executable, "-c", CHILD_JOB, flag_loc],
+        stdout=subprocess.PIPE,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        text=True,
+    )
+    try:
+        assert job.stdout is not None and job.stdout.readline() == "ready\n"
+        threads = psutil.Process(job.pid).threads()
+        assert len(threads) >= 3  # main, watcher and worker
+        governor.set_recording(True, flag_loc)
+        _wait_for(
+            lambda: all(
+                os.getpriority(os.PRIO_PROCESS, thread.id)
+                == governor.LOWEST_NICE
+                for thread in threads
+            )
+        )
+    finally:
+        governor.set_recording(False, flag_loc)
+        job.kill()
+        job.wait()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_memory_budget(tmp_path):
+    """Verify going over the memory budget stops processing"""
+    flag_loc = str(tmp_path / ".recording")
+    roomy = ResourceGovernor(memory_budget_mb=1e6, recording_flag=flag_loc)
+    roomy.checkpoint()
+    tight = ResourceGovernor(memory_budget_mb=1, recording_flag=flag_loc)
+    with pytest.raises(ResourceBudgetExceeded):
+        tight.checkpoint()
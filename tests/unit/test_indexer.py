@@ -0,0 +1,89 @@
+from contextlib import closing
+
+from click.testing import CliRunner
+
+from meetaid import indexer
+
+TRANSCRIPT = (
+    "Transcript:\n"
+    "[0:00:05-0:00:12] SPEAKER_00:  We need to cut the budget.\n\n"
+    "[0:00:12-0:01:03] SPEAKER_01:  Let's review hiring next week.\n\n"
+)
+VIDEO_TEXT = (
+    "Video Text:\n"
+    "[00:00:00.000-00:00:05.500]:  ['Q3 Budget', 'Revenue']\n\n"
+)
+
+
+def test_parse_output():
+    """Verify transcript and video text files are parsed into segments"""
+    source, segments = indexer.parse_output(TRANSCRIPT)
+    assert source == indexer.SOURCE_TRANSCRIPT
+    assert segments[1] == {
+        "start": 12.0,
+        "end": 63.0,
+        "speaker": "SPEAKER_01",
+        "text": " Let's review hiring next week.",
+    }
+    source, segments = indexer.parse_output(VIDEO_TEXT)
+    assert source == indexer.SOURCE_VIDEO
+    assert segments == [
+        {"start": 0.0, "end": 5.5, "text": "Q3 Budget Revenue"}
+    ]
+    assert indexer.parse_output("Notes:\n") is None
+
+
+def test_index_and_search(tmp_path):
+    """Verify files are indexed once and matching moments are found"""
+    (tmp_path / "audio_20231202-092450.txt").write_text(TRANSCRIPT)
+    (tmp_path / "video_20231202-092450.txt").write_text(VIDEO_TEXT)
+    with closing(indexer.connect(":memory:")) as conn:
+        assert indexer.index_path(conn, str(tmp_path)) == 2
+        assert indexer.index_path(conn, str(tmp_path)) == 0
+
+        hits = indexer.search(conn, "budget")
+        assert len(hits) == 2
+        assert {hit["meeting_id"] for hit in hits} == {"20231202-092450"}
+        assert {hit["source"] for hit in hits} == {"transcript", "video"}
+
+        hits = indexer.search(conn, "hiring")
+        assert hits[0]["speaker"] == "SPEAKER_01"
+        assert hits[0]["start"] == 12.0
+
+
+def test_search_plain_input(tmp_path):
+    """Verify punctuation in ordinary queries is not read as FTS5 syntax"""
+    assert indexer.quote_query("what's the budget?") == (
+        '"what\'s" "the" "budget?"'
+    )
+    assert indexer.quote_query('(q3* OR "action items") NOT hiring') == (
+        '( "q3"* OR "action items" ) NOT "hiring"'
+    )
+    (tmp_path / "video_20231202-092450.txt").write_text(
+        "Video Text:\n[00:00:00.000-00:00:05.500]:  ['Q3-results']\n\n"
+    )
+    (tmp_path / "audio_20231202-092450.txt").write_text(TRANSCRIPT)
+    with closing(indexer.connect(":memory:")) as conn:
+        indexer.index_path(conn, str(tmp_path))
+        assert len(indexer.search(conn, "Q3-results")) == 1
+        assert len(indexer.search(conn, "what's the budget?")) == 0
+        assert len(indexer.search(conn, "the budget?")) == 1
+
+
+def test_search_command_invalid_query(tmp_path):
+    """Verify an invalid query is reported without a traceback"""
+    result = CliRunner().invoke(
+        indexer.main, ["--db", str(tmp_path / "index.db"), "search", "q3 AND"]
+    )
+    assert result.exit_code == 1
+    assert "Invalid query" in result.output
+
+
+def test_index_command_missing_path(tmp_path):
+    """Verify a missing path is reported without a traceback"""
+    result = CliRunner().invoke(
+        indexer.main,
+        ["--db", str(tmp_path / "index.db"), "index", str(tmp_path / "no")],
+    )
+    assert result.exit_code == 2
+    assert "does not exist" in result.output
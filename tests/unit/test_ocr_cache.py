@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+from meetaid import ocr_cache
+
+
+def _slide():
+    frame = np.full((200, 300, 3), 255, np.uint8)
+    frame[20:40, 20:200] = 0  # title
+    frame[100:110, 20:150] = 0  # bullet
+    return frame
+
+
+def test_dhash_near_identical_frames():
+    """Verify small noise barely changes the hash and new content does"""
+    frame = _slide()
+    noisy = frame.copy()
+    noisy[150, 250] = 128
+    other = np.full_like(frame, 255)
+    other[150:190, 50:280] = 0
+    frame_hash = ocr_cache.dhash(frame)
+    assert ocr_cache.hamming(frame_hash, ocr_cache.dhash(noisy)) <= 1
+    assert ocr_cache.hamming(frame_hash, ocr_cache.dhash(other)) > 4
+
+
+def _template_slide(*bullets, scale=1.2):
+    frame = np.full((620, 1100, 3), 255, np.uint8)
+    cv2.putText(
+        frame, "Quarterly Review", (60, 90), cv2.FONT_HERSHEY_SIMPLEX, 2, 0, 4
+    )
+    for i, bullet in enumerate(bullets):
+        cv2.putText(
+            frame,
+            bullet,
+            (80, 220 + 60 * i),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            scale,
+            (40, 40, 40),
+            2,
+        )
+    return frame
+
+
+def _template_results(*bullets, scale=1.2):
+    """OCR results as easyocr would box the text of `_template_slide`"""
+    results = [((60, 50, 640, 100), "Quarterly Review")]
+    for i, bullet in enumerate(bullets):
+        (width, height), _ = cv2.getTextSize(
+            bullet, cv2.FONT_HERSHEY_SIMPLEX, scale, 2
+        )
+        baseline = 220 + 60 * i
+        results.append(((80, baseline - height, 80 + width, baseline), bullet))
+    return results
+
+
+def _with_cursor(frame, x=600, y=400):
+    frame = frame.copy()
+    arrow = np.array([[x, y], [x, y + 20], [x + 5, y + 15], [x + 12, y + 15]])
+    cv2.fillPoly(frame, [arrow], (0, 0, 0))
+    return frame
+
+
+def test_cache_lookup_and_persistence(tmp_path):
+    """Verify results are found for a re-encoded frame after a reopen"""
+    cache_loc = str(tmp_path / "ocr_cache.db")
+    frame = _template_slide("Revenue up 12%")
+    results = [((80, 190, 420, 230), "Revenue up 12%")]
+    cache = ocr_cache.OCRCache(cache_loc)
+    cache.put(frame, results)
+    cache.close()
+
+    _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    cache = ocr_cache.OCRCache(cache_loc)
+    assert cache.get(frame) == results
+    assert cache.get(cv2.imdecode(jpeg, cv2.IMREAD_COLOR)) == results
+    assert cache.get(_slide()) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_cache_same_template_different_text():
+    """Verify slides that only differ in their text are not confused"""
+    for scale in (1.2, 0.6):
+        first = _template_slide("Revenue up 12%", scale=scale)
+        second = _template_slide("Revenue up 21%", scale=scale)
+        # The hashes alone would match
+        assert (
+            ocr_cache.hamming(ocr_cache.dhash(first), ocr_cache.dhash(second))
+            <= ocr_cache.MAX_HASH_DISTANCE
+        )
+        cache = ocr_cache.OCRCache(":memory:")
+        cache.put(first, _template_results("Revenue up 12%", scale=scale))
+        assert cache.get(second) is None
+        other = _template_slide("Hiring plan", "Office move", scale=scale)
+        assert cache.get(other) is None
+        cache.close()
+
+
+def test_cache_ignores_cursor():
+    """Verify a mouse cursor away from the text doesn't stop reuse"""
+    frame = _template_slide("Revenue up 12%")
+    results = _template_results("Revenue up 12%")
+    cache = ocr_cache.OCRCache(":memory:")
+    cache.put(frame, results)
+    assert cache.get(_with_cursor(frame)) == results
+    cache.close()
+
+
+def test_changed_regions_small_changes():
+    """Verify small changes only count where there was text"""
+    previous = _slide()
+    current = previous.copy()
+    current[150, 250] = 0
+    assert ocr_cache.changed_regions(previous, current) == []
+    regions = ocr_cache.changed_regions(
+        previous, current, text_boxes=[(240, 140, 260, 160)]
+    )
+    assert len(regions) == 1
+
+
+def test_changed_regions_merge():
+    """Verify only the changed line is replaced in the previous results"""
+    previous = _slide()
+    current = previous.copy()
+    current[100:110, 20:150] = 255
+    current[100:110, 20:100] = 0  # shorter bullet
+    previous_results = [
+        ((20, 20, 200, 40), "Agenda"),
+        ((20, 100, 150, 110), "First point"),
+    ]
+    regions = ocr_cache.changed_regions(previous, current)
+    assert len(regions) == 1
+    assert ocr_cache.changed_fraction(regions, current.shape) < 0.1
+    regions = ocr_cache.expand_regions(regions, previous_results)
+    left, top, right, bottom = regions[0]
+    assert left <= 20 and top <= 100 and right >= 150 and bottom >= 110
+    merged = ocr_cache.merge_results(
+        previous_results, regions, [((20, 100, 100, 110), "First")]
+    )
+    assert [text for _, text in merged] == ["Agenda", "First"]
@@ -0,0 +1,20 @@
+from meetaid import profile
+
+
+def test_profile_round_trip(tmp_path, monkeypatch):
+    """Verify a saved profile is loaded section by section"""
+    profile_loc = str(tmp_path / "profile.json")
+    monkeypatch.setenv(profile.PROFILE_ENV, profile_loc)
+    assert profile.load_profile("transcriber") == {}
+    settings = {"whisper_model": "small.en", "device": "cpu", "fp16": False}
+    assert profile.save_profile({"transcriber": settings}) == profile_loc
+    assert profile.load_profile("transcriber") == settings
+    assert profile.load_profile("reader") == {}
+
+
+def test_unreadable_profile(tmp_path, monkeypatch):
+    """Verify a corrupt profile falls back to the defaults"""
+    profile_loc = tmp_path / "profile.json"
+    profile_loc.write_text("{not json")
+    monkeypatch.setenv(profile.PROFILE_ENV, str(profile_loc))
+    assert profile.load_profile("reader") == {}
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+from meetaid import scenes
+
+FPS = 10.0
+COLORS = [(0, 0, 0), (255, 255, 255), (0, 0, 255)]
+
+
+def _write_video(path):
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (160, 90)
+    )
+    for i in range(300):
+        frame = np.zeros((90, 160, 3), np.uint8)
+        frame[:] = COLORS[i // 100]
+        writer.write(frame)
+    writer.release()
+
+
+def _frames(scene_list):
+    return [
+        (start.get_frames(), end.get_frames()) for start, end in scene_list
+    ]
+
+
+def test_parallel_matches_single(tmp_path):
+    """Verify cuts at and between range edges survive stitching"""
+    video_path = str(tmp_path / "video.avi")
+    _write_video(video_path)
+    expected = [(0, 100), (100, 200), (200, 300)]
+    assert _frames(scenes.detect_scenes(video_path)) == expected
+    for workers in (2, 3):
+        scene_list = scenes.detect_scenes(
+            video_path, workers=workers, segment_seconds=1
+        )
+        assert _frames(scene_list) == expected
+    scene_list = scenes.detect_scenes(
+        video_path, downscale=2, frame_skip=1, workers=2, segment_seconds=1
+    )
+    assert _frames(scene_list) == expected
+
+
+def test_stitch_cuts():
+    """Verify duplicate and too-close cuts from overlapping ranges drop"""
+    assert scenes.stitch_cuts([100, 30, 100, 105, 10]) == [30, 100]
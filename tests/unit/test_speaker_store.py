@@ -0,0 +1,39 @@
+import numpy as np
+
+from meetaid.speaker_store import SpeakerStore
+
+
+def test_enroll_and_identify(tmp_path):
+    """Verify labels are matched to the nearest enrolled speaker"""
+    db_loc = str(tmp_path / "speakers.db")
+    store = SpeakerStore(db_loc)
+    store.enroll("Alice", np.array([1.0, 0.0, 0.0]))
+    store.enroll("Bob", np.array([0.0, 1.0, 0.0]))
+    store.close()
+
+    store = SpeakerStore(db_loc)
+    assert store.speakers() == {"Alice": 1, "Bob": 1}
+    names = store.identify(
+        {
+            "SPEAKER_00": np.array([0.1, 2.0, 0.0]),
+            "SPEAKER_01": np.array([3.0, 0.2, 0.1]),
+            "SPEAKER_02": np.array([2.0, 0.5, 0.0]),
+            "SPEAKER_03": np.array([0.0, 0.0, 1.0]),
+        }
+    )
+    assert names == {"SPEAKER_00": "Bob", "SPEAKER_01": "Alice"}
+    assert store.remove("Bob") == 1
+    assert store.match(np.array([0.0, 1.0, 0.0])) is None
+    store.close()
+
+
+def test_file_embedding_cache():
+    """Verify cached embeddings are keyed by the recording signature"""
+    store = SpeakerStore(":memory:")
+    embeddings = {"SPEAKER_00": np.array([1.0, 2.0], dtype=np.float32)}
+    store.put_file_embeddings("/a.wav", "sig1", embeddings)
+    cached = store.get_file_embeddings("/a.wav", "sig1")
+    assert np.array_equal(cached["SPEAKER_00"], embeddings["SPEAKER_00"])
+    assert store.get_file_embeddings("/a.wav", "sig2") is None
+    assert store.get_file_embeddings("/a.wav") is not None
+    store.close()
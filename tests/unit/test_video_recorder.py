@@ -0,0 +1,37 @@
+import numpy as np
+
+from meetaid.video_recorder import clip_region, fit_frame, frame_size
+
+SCREEN = (1920, 1080)
+
+
+def test_clip_region():
+    """Verify windows are clipped to the screen, or rejected if mostly off"""
+    assert clip_region((100, 100, 800, 600), SCREEN) == (100, 100, 800, 600)
+    assert clip_region((-100, 50, 1000, 600), SCREEN) == (0, 50, 900, 600)
+    assert clip_region((1500, 100, 600, 800), SCREEN) == (1500, 100, 420, 800)
+    # On a second monitor
+    assert clip_region((2000, 100, 1280, 800), SCREEN) is None
+    assert clip_region((1900, 100, 1280, 800), SCREEN) is None
+    # Too small to read
+    assert clip_region((0, 0, 200, 100), SCREEN) is None
+
+
+def test_frame_size():
+    """Verify frames are downscaled only as far as text stays legible"""
+    assert frame_size((0, 0, 1920, 1080), 14, 12) == (1646, 926)
+    assert frame_size((0, 0, 1920, 1080), 24, 12) == (960, 540)
+    assert frame_size((0, 0, 1101, 621), None) == (1100, 620)
+    assert frame_size((0, 0, 800, 600), 10, 12) == (800, 600)
+    assert frame_size((0, 0, 1, 1), None) == (2, 2)
+
+
+def test_fit_frame():
+    """Verify frames are scaled into the output size and letterboxed"""
+    frame = np.full((400, 400, 3), 255, np.uint8)
+    fitted = fit_frame(frame, (800, 400))
+    assert fitted.shape == (400, 800, 3)
+    assert fitted[:, 200:600].min() == 255
+    assert fitted[:, :200].max() == 0 and fitted[:, 600:].max() == 0
+    assert fit_frame(frame, (400, 400)) is frame
+    assert fit_frame(frame, (200, 200)).shape == (200, 200, 3)